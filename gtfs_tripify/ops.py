@@ -3,7 +3,6 @@ Operations defined on logbooks.
 """
 
 import warnings
-import itertools
 from collections import defaultdict
 from datetime import datetime, timedelta
 import pytz
@@ -15,6 +14,19 @@ from google.transit import gtfs_realtime_pb2
 from gtfs_tripify.utils import synthesize_route, finish_trip
 
 
+# Protobuf parsing is one of the most expensive steps in building a logbook, and the pure-Python 
+# Protobuf implementation is an order of magnitude or more slower than the compiled ones (upb or 
+# cpp). It is silently used as a fallback when no compiled implementation is available, so point
+# it out (once) when it is the one used to parse a feed.
+try:
+    from google.protobuf.internal import api_implementation
+    _PROTOBUF_IMPLEMENTATION = api_implementation.Type()
+except ImportError:
+    _PROTOBUF_IMPLEMENTATION = None
+
+_warned_protobuf_implementation = False
+
+
 ##############
 # HEURISTICS #
 ##############
@@ -54,21 +66,25 @@ def cut_cancellations(logbook):
         # Immediately return if the log is empty.
         if len(log) == 0:
             return log
+
+        times = log['latest_information_time'].values
+        unique_times = pd.unique(times)
+
         # Heuristically return an empty log if there are zero confirmed stops in the log.
-        elif (~(log.action == "STOPPED_AT").any() and 
-              len(log.latest_information_time.unique())) == 1:
+        if len(unique_times) == 1 and not (log['action'].values == 'STOPPED_AT').any():
             return log.head(0)
         else:
-            # Find the last definite stop.
-            last_definite_stop = (log.latest_information_time ==\
-                log.latest_information_time.unique()[-1]).idxmax() - 1
+            # Find the last definite stop. Everything from the first appearance of the most 
+            # recently seen information time onwards is suspect. Positions are used throughout, 
+            # as the log's index need not be a range index (e.g. when read in using `from_csv`).
+            suspicious_block_start = np.argmax(times == unique_times[-1])
+            suspicious_block_len = len(times) - suspicious_block_start
             # Heuristically cut len >= 2 `STOPPED_OR_SKIPPED` blocks with the same 
             # `LATEST_INFORMATION_TIME`.
-            suspicious_block = log.tail(-last_definite_stop - 1)
-            if len(suspicious_block) == 1:
+            if suspicious_block_start == 0 or suspicious_block_len == 1:
                 return log
-            elif len(suspicious_block['latest_information_time'].unique()) == 1:
-                return log.head(last_definite_stop + 1)
+            elif len(pd.unique(times[suspicious_block_start:])) == 1:
+                return log.head(suspicious_block_start)
             else:
                 return log
 
@@ -110,22 +126,31 @@ def discard_partial_logs(logbook):
 
     The best course of action is dependent on your use case.
     """
-    trim = logbook.copy()
+    # A trip contains the first (or last) information time in the logbook exactly when its own 
+    # earliest (or latest) information time is that time, so a single min/max pass per trip 
+    # suffices.
+    bounds = dict()
+    for trip_id, trip_log in logbook.items():
+        if len(trip_log) == 0:
+            continue
+        # Typed logs are already integer, in which case this is a view, not a copy.
+        times = trip_log['latest_information_time'].values.astype(int, copy=False)
+        bounds[trip_id] = (times.min(), times.max())
 
-    times = np.array(
-        list(
-            itertools.chain(
-                *[logbook[trip_id]['latest_information_time'].values for trip_id in logbook.keys()]
-            )
-        )
-    ).astype(int)
-    first, last = np.min(times), np.max(times)
+    if len(bounds) == 0:
+        return dict(logbook)
 
-    for trip_id in logbook.keys():
-        if logbook[trip_id]['latest_information_time'].astype(int).isin([first, last]).any():
-            trim.pop(trip_id)
+    first = min(trip_first for trip_first, _ in bounds.values())
+    last = max(trip_last for _, trip_last in bounds.values())
+    partial_trip_ids = {
+        trip_id for trip_id, (trip_first, trip_last) in bounds.items()
+        if trip_first == first or trip_last == last
+    }
 
-    return trim
+    return {
+        trip_id: trip_log for trip_id, trip_log in logbook.items()
+        if trip_id not in partial_trip_ids
+    }
 
 
 def drop_invalid_messages(update):
@@ -135,88 +160,111 @@ def drop_invalid_messages(update):
     made by the feed publisher. A warning is raised and the non-conformant messages are dropped.
     """
     parse_errors = []
-    fixed_update = {'header': update['header'], 'entity': []}
+    update_timestamp = update['header']['timestamp']
+    fixed_update = {'header': update['header']}
     trip_ids_to_drop = set()
-    trip_ids_seen = []
+    first_idx_by_trip_id = dict()
     messages_to_drop_idxs = set()
     trip_update_ids = set()
     vehicle_update_ids = set()
+    vehicle_update_idxs = defaultdict(list)
 
     # Capture and throw away messages which (1) null trip_id values or (2) empty stop sequences.
     for idx, message in enumerate(update['entity']):
-        if message['type'] == 'vehicle_update':
-            message_type = 'vehicle_update'
+        message_type = message['type']
+        if message_type == 'vehicle_update':
             message_trip_id = message['vehicle']['trip']['trip_id']
             vehicle_update_ids.add(message_trip_id)
-        elif message['type'] == 'trip_update':
-            message_type = 'trip_update'
-            message_trip_id = message['trip_update']['trip']['trip_id']
-            number_of_stops_remaining = len(message['trip_update']['stop_time_update'])
+            vehicle_update_idxs[message_trip_id].append(idx)
+        elif message_type == 'trip_update':
+            trip_update = message['trip_update']
+            message_trip_id = trip_update['trip']['trip_id']
+            number_of_stops_remaining = len(trip_update['stop_time_update'])
             trip_update_ids.add(message_trip_id)
         else:  # message['type'] == 'alert'
             continue
 
         if message_trip_id == '':
             messages_to_drop_idxs.add(idx)
-            warnings.warn(
-                f"The message at the {idx} position in the GTFS-RT update for "
-                f"{update['header']['timestamp']} has a null trip id. This invalid "
-                f"message was removed from the update during pre-processing."
-            )
             parse_errors.append({
                 'type': 'message_with_null_trip_id',
                 'details': {
-                    'update_timestamp': update['header']['timestamp'],
+                    'update_timestamp': update_timestamp,
                     'message_index': idx,
                     'message_body': message
                 }
             })
         elif message_type == 'trip_update' and number_of_stops_remaining == 0:
             messages_to_drop_idxs.add(idx)
-            warnings.warn(
-                f"The trip with the ID {message_trip_id} was provided a trip update with "
-                f"no stops in it in the GTFS-RT update for {update['header']['timestamp']}. "
-                f"The messages corresponding with this invalid trip were removed from the "
-                f"update during pre-processing."
-            )
             trip_ids_to_drop.add(message_trip_id)
             parse_errors.append({
                 'type': 'trip_has_trip_update_with_no_stops_remaining',
                 'details': {
-                    'update_timestamp': update['header']['timestamp'],
+                    'update_timestamp': update_timestamp,
                     'message_index': idx,
                     'message_body': message
                 }
             })
-            if message_trip_id in trip_ids_seen:
-                complimentary_message_to_drop_idx = trip_ids_seen.index(message_trip_id)
+            if message_trip_id in first_idx_by_trip_id:
+                complimentary_message_to_drop_idx = first_idx_by_trip_id[message_trip_id]
                 messages_to_drop_idxs.add(complimentary_message_to_drop_idx)
         elif message_trip_id in trip_ids_to_drop:
             messages_to_drop_idxs.add(idx)
 
-        trip_ids_seen.append(message_trip_id)
+        if message_trip_id not in first_idx_by_trip_id:
+            first_idx_by_trip_id[message_trip_id] = idx
 
-    # Capture and throw away vehicle updates that do not also have trip updates.
+    # Capture trip updates that do not also have vehicle updates.
     # Note that this can result in multiple validation errors against a single message.
     trip_update_only_ids = trip_update_ids.difference(vehicle_update_ids)
     for trip_update_only_id in trip_update_only_ids:
-        warnings.warn(
-            f"The trip with ID {trip_update_only_id} is provided a vehicle update but no "
-            f"trip update in the GTFS-R update for {update['header']['timestamp']}. "
-            f"This invalid trip was removed from the update during pre-processing."
-        )
         parse_errors.append({
             'type': 'trip_id_with_trip_update_but_no_vehicle_update',
             'details': {
                 'trip_id': trip_update_only_id,
-                'update_timestamp': update['header']['timestamp']
+                'update_timestamp': update_timestamp
             }
         })
         messages_to_drop_idxs.add(trip_update_only_id)
 
-    for idx, message in enumerate(update['entity']):
-        if idx not in messages_to_drop_idxs:
-            fixed_update['entity'].append(message)
+    # Capture and throw away vehicle updates that do not also have trip updates. These carry no stop
+    # information, so they cannot be used further downstream. Messages with a null trip_id have
+    # already been captured above.
+    vehicle_update_only_ids = vehicle_update_ids.difference(trip_update_ids)
+    vehicle_update_only_ids.discard('')
+    for vehicle_update_only_id in sorted(vehicle_update_only_ids):
+        for idx in vehicle_update_idxs[vehicle_update_only_id]:
+            messages_to_drop_idxs.add(idx)
+            parse_errors.append({
+                'type': 'trip_id_with_vehicle_update_but_no_trip_update',
+                'details': {
+                    'trip_id': vehicle_update_only_id,
+                    'update_timestamp': update_timestamp,
+                    'message_index': idx,
+                    'message_body': update['entity'][idx]
+                }
+            })
+
+    fixed_update['entity'] = [
+        message for idx, message in enumerate(update['entity'])
+        if idx not in messages_to_drop_idxs
+    ]
+
+    # Raise a single warning summarizing everything that was dropped from this update, instead of
+    # one per offending message: feeds with many bad messages would otherwise spend much of their
+    # time in the warnings machinery. Per-message details are available in the parse errors.
+    if len(parse_errors) > 0:
+        error_counts = defaultdict(int)
+        for parse_error in parse_errors:
+            error_counts[parse_error['type']] += 1
+        error_summary = ', '.join(
+            f"{error_type} ({count})" for error_type, count in error_counts.items()
+        )
+        warnings.warn(
+            f"The GTFS-RT update for {update_timestamp} contains invalid messages, "
+            f"which were removed from the update during pre-processing. The following errors were "
+            f"found: {error_summary}. Refer to the parse errors for details."
+        )
 
     return fixed_update, parse_errors
 
@@ -416,22 +464,53 @@ def merge_logbooks(logbook_tuples):
 
         logbook, timestamps = gt.ops.merge([(logbook1, timestamps1), (logbook2, timestamps2)])
     """
+    # The set of incomplete trips in the merged logbook is carried from join to join, as 
+    # recomputing it from scratch every time would make the merge quadratic in the number of 
+    # trips.
     left = dict()
     left_timestamps = dict()
+    incomplete_trips_left = []
+    route_cache = dict()
     for (right, right_timestamps) in logbook_tuples:
-        left, left_timestamps = join_logbooks(left, left_timestamps, right, right_timestamps)
+        left, left_timestamps, incomplete_trips_left = _join_logbooks(
+            left, left_timestamps, right, right_timestamps, incomplete_trips_left, route_cache
+        )
     return left, left_timestamps
 
 
 def join_logbooks(left, left_timestamps, right, right_timestamps):
     """
-    Given two trip logbooks and their associated timestamps, get their merger.
+    Given two trip logbooks and their associated timestamps, get their merger. If either logbook
+    is empty, the other one is returned as-is.
+    """
+    left, left_timestamps, _ = _join_logbooks(left, left_timestamps, right, right_timestamps)
+    return left, left_timestamps
+
+
+def _get_incomplete_trips(logbook, unique_trip_ids):
+    """
+    Returns the subset of the given unique trip ids whose trips in the logbook are incomplete,
+    in logbook order.
+    """
+    return [unique_trip_id for unique_trip_id in logbook if unique_trip_id in unique_trip_ids
+            and logbook[unique_trip_id].action.iloc[-1] == 'EN_ROUTE_TO']
+
+
+def _join_logbooks(left, left_timestamps, right, right_timestamps, incomplete_trips_left=None,
+                   route_cache=None):
+    """
+    Implementation of `join_logbooks`. Optionally takes the list of incomplete trips in the left
+    logbook as an additional argument (if it is not provided it is computed), and returns the list
+    of incomplete trips in the merged logbook as an additional output. `route_cache` is passed on
+    to `synthesize_route`.
     """
     # Trivial cases.
     if len(right) == 0:
-        return left, left_timestamps
+        return left, left_timestamps, incomplete_trips_left
     if len(left) == 0:
-        return right, right_timestamps
+        return right, right_timestamps, _get_incomplete_trips(right, right)
+    if incomplete_trips_left is None:
+        incomplete_trips_left = _get_incomplete_trips(left, left)
 
     # TODO: attempt to reroot trips that cancel in between logbooks instead of always cancelling
     # There are five kinds of joins that we care about (but see the above).
@@ -441,18 +520,19 @@ def join_logbooks(left, left_timestamps, right, right_timestamps):
     #     as cancellations. A future improvement would be to
     # (4) incomplete trips on the left side that do appear on the right, these are joiners
     # (5) incomplete trips on the right side that do not appear on the left, just append
-    incomplete_trips_left = [unique_trip_id for unique_trip_id in left\
-        if left[unique_trip_id].action.iloc[-1] == 'EN_ROUTE_TO']
     left_map = {left[unique_trip_id].trip_id.iloc[0]: unique_trip_id for
                 unique_trip_id in incomplete_trips_left}
     right_map = {left[unique_trip_id].trip_id.iloc[0]: None for 
                  unique_trip_id in incomplete_trips_left}
-    first_right_timestamp = np.min(np.min([*(itertools.chain(right_timestamps.values()))]))
+    first_right_timestamp = np.concatenate(list(right_timestamps.values())).min()
 
     # determine candidate right trips based on trip_id match
     # pick the one which appears in the first timestamp included in the right time slice
     # and run _join_trip_logs on that matched object
     # if no such trip exists, this is a cancellation, so perform the requisite work
+    # trips which were appended or joined may be incomplete in the merged logbook; all others are
+    # complete by construction
+    touched = set()
     for unique_trip_id_right in right:
         right_trip = right[unique_trip_id_right]
         trip_id = right_trip.trip_id.iloc[0]
@@ -461,24 +541,26 @@ def join_logbooks(left, left_timestamps, right, right_timestamps):
         if trip_id not in left_map:
             left[unique_trip_id_right] = right_trip
             left_timestamps[unique_trip_id_right] = right_timestamps[unique_trip_id_right]
+            touched.add(unique_trip_id_right)
 
         # if there is a match we need to do more work
         elif (trip_id in left_map and
             right_timestamps[unique_trip_id_right][0] == first_right_timestamp):
             assert right_map[trip_id] is None
-            right_map[trip_id] = right[unique_trip_id_right]
+            right_map[trip_id] = unique_trip_id_right
 
     for trip_id in right_map:
-        trip_data_right = right_map[trip_id]
+        unique_trip_id_right = right_map[trip_id]
         unique_trip_id_left = left_map[trip_id]
 
         # for trips we found a match for, perform the merge
-        if trip_data_right is not None:
-            left[left_map[trip_id]] = _join_trip_logs(
-                left[unique_trip_id_left], trip_data_right
+        if unique_trip_id_right is not None:
+            left[unique_trip_id_left] = _join_trip_logs(
+                left[unique_trip_id_left], right[unique_trip_id_right], route_cache
             )
             left_timestamps[unique_trip_id_left] =\
                 left_timestamps[unique_trip_id_left] + right_timestamps[unique_trip_id_right]
+            touched.add(unique_trip_id_left)
             del left_map[trip_id]
 
         # for trips we did not find a match for, finalize as a cancellation
@@ -492,10 +574,10 @@ def join_logbooks(left, left_timestamps, right, right_timestamps):
         unique_trip_id = left_map[trip_id]
         left[unique_trip_id] = finish_trip(left[unique_trip_id], first_right_timestamp)
 
-    return left, left_timestamps
+    return left, left_timestamps, _get_incomplete_trips(left, touched)
 
 
-def _join_trip_logs(left, right):
+def _join_trip_logs(left, right, route_cache=None):
     """
     Two trip logs may contain information based on action logs, and GTFS-Realtime feed updates, 
     which are discontiguous in time. In other words, these logs reflect the same trip, but are 
@@ -517,29 +599,27 @@ def _join_trip_logs(left, right):
         left, right = right, left
 
     # Get the combined synthetic station list.
-    stations = synthesize_route([list(left['stop_id'].values), list(right['stop_id'].values)])
-    right_stations = set(right['stop_id'].values)
-
-    # Combine the station information in last-precedent order.
-    l_i = 0
-    left_indices = []
+    stations = synthesize_route(
+        [list(left['stop_id'].values), list(right['stop_id'].values)], route_cache
+    )
 
-    for station in stations:
-        if station not in right_stations:
-            left_indices.append(l_i)
-            l_i += 1
+    # Combine the station information in last-precedent order. The left log contributes as many
+    # leading records as there are stations which do not appear in the right log.
+    n_left = np.count_nonzero(np.isin(stations, right['stop_id'].values, invert=True))
 
-    # Combine records.
-    join = pd.concat([left.iloc[left_indices], right]).reset_index(drop=True)
+    # Combine records. `join` is modified in place below, so it must not share memory with the
+    # input logs.
+    join = pd.concat([left.iloc[:n_left], right], ignore_index=True)
 
     # Declaring an ordinal categorical column in the stop_id attribute makes `pandas` handle 
     # resorting internally and, hence, results in a significant speedup (over doing so ourselves).
-    join['stop_id'] = pd.Categorical(join['stop_id'], stations, ordered=True)
+    stop_id_dtype = pd.api.types.CategoricalDtype(categories=stations, ordered=True)
+    join['stop_id'] = join['stop_id'].astype(stop_id_dtype)
 
     # Update records for stations before the first station in the right trip log that the train
     # is EN_ROUTE_TO or STOPPED_OR_SKIPPED.
     swap_station = right.iloc[0]['stop_id']
-    swap_index = next(i for i, station in enumerate(stations) if station == swap_station)
+    swap_index = stations.index(swap_station)
     swap_space = join[:swap_index]
     where_update = swap_space[swap_space['action'] == 'EN_ROUTE_TO'].index.values
 
@@ -565,9 +645,14 @@ def _join_trip_logs(left, right):
     # 3. The prior states that the train stopped at (or skipped) the last station in that log at
     #    some known maximum time, but the posterior log first entry minimum time is even earlier.
     #
-    # The next two lines handle cases (1) and (2), and the code block after that handles case (3).
-    join.loc[:, 'minimum_time'] = join.loc[:, 'minimum_time'].fillna(method='ffill')
-    join.loc[1:, 'minimum_time'] = np.maximum.accumulate(join.loc[1:, 'minimum_time'].values)
+    # The next block handles cases (1) and (2), and the code block after that handles case (3).
+    # Case (1) is a forward fill and case (2) is a running maximum (excluding the first entry);
+    # both are computed on the raw array and written back to the frame once.
+    minimum_times = join['minimum_time'].values.astype(float)
+    filled_idxs = np.where(np.isnan(minimum_times), 0, np.arange(len(minimum_times)))
+    minimum_times = minimum_times[np.maximum.accumulate(filled_idxs)]
+    minimum_times[1:] = np.maximum.accumulate(minimum_times[1:])
+    join['minimum_time'] = minimum_times
 
     # A sequence of stops at the end of the left stop sequence may not appear in the right stop
     # sequence. When the join is performed, `synthesize_route` will excise those stations b/c 
@@ -603,11 +688,30 @@ def _join_trip_logs(left, right):
 # I/O #
 #######
 
+def warn_if_slow_protobuf(stacklevel=2):
+    """
+    Warns (once) if feeds will be parsed by the pure-Python Protobuf implementation. Called by the
+    entry points that parse feeds; `stacklevel` is as in `warnings.warn`, counting from the
+    caller of this function, and should point at user code.
+    """
+    global _warned_protobuf_implementation
+    if _PROTOBUF_IMPLEMENTATION == 'python' and not _warned_protobuf_implementation:
+        _warned_protobuf_implementation = True
+        warnings.warn(
+            "The pure-Python Protobuf implementation is in use, which makes parsing feeds very "
+            "slow. Install a build of protobuf that ships a compiled implementation, and make sure "
+            "that PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION is not set to 'python'.",
+            stacklevel=stacklevel + 1
+        )
+
+
 def parse_feed(bytes):
     """
     Helper function for reading a feed in using Protobuf. 
     Handles bad feeds by replacing them with None.
     """
+    warn_if_slow_protobuf()
+
     # TODO: tests.
     with warnings.catch_warnings():
         warnings.simplefilter("error")
@@ -713,12 +817,22 @@ def to_gtfs(logbook, filename, tz=None, output=False):
         out.to_csv(filename, index=False)
 
 
+# The column types of a logbook written to CSV.
+CSV_DTYPES = {
+    'trip_id': str, 'route_id': str, 'action': str, 'minimum_time': 'float', 
+    'maximum_time': 'float', 'stop_id': str, 'latest_information_time': 'int', 
+    'unique_trip_id': str
+}
+
+
 def to_csv(logbook, filename, output=False):
     """
     Write a logbook to a CSV file.
     
     The output file is readable using an ordinary CSV reader, e.g. ``pandas.read_csv``.
     Alternatively you may read it back into a logbook format using ``gt.ops.from_csv``.
+
+    ``filename`` may also be a file-like object, e.g. an ``io.StringIO`` buffer.
     """
     logs = []
     for unique_trip_id in logbook:
@@ -729,11 +843,11 @@ def to_csv(logbook, filename, output=False):
         df = pd.DataFrame(
             columns=[
                 'trip_id', 'route_id', 'action', 'minimum_time', 'maximum_time', 'stop_id',
-                'latest_information_time', 'unique_trip'
+                'latest_information_time', 'unique_trip_id'
             ]
         )
     else:
-        df = pd.concat(logs)
+        df = pd.concat(logs, ignore_index=True, copy=False)
 
     if output:
         return df
@@ -743,10 +857,14 @@ def to_csv(logbook, filename, output=False):
 
 def from_csv(filename):
     """
-    Read a logbook from a CSV file (as written to by ``gt.ops.to_csv``).
+    Read a logbook from a CSV file (as written to by ``gt.ops.to_csv``). ``filename`` may also be
+    a file-like object.
     """
-    g = pd.read_csv(filename).groupby('unique_trip_id')
-    return {k: df.drop(columns='unique_trip_id') for k, df in g}
+    # Spell out the column types, so that pandas does not have to infer them, and so that ID 
+    # columns which happen to look numeric (e.g. a route_id of '1') are not read in as numbers.
+    df = pd.read_csv(filename, dtype=CSV_DTYPES)
+    unique_trip_ids = df.pop('unique_trip_id')
+    return {k: log for k, log in df.groupby(unique_trip_ids)}
 
 
 __all__ = [
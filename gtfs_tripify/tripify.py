@@ -10,18 +10,35 @@ those action logs are compacted into logs in a logbook.
 """
 
 import itertools
+import sys
+import warnings
 from collections import defaultdict
-import uuid
 
 import numpy as np
 import pandas as pd
 
 from gtfs_tripify.utils import synthesize_route, finish_trip
 from gtfs_tripify.ops import (
-    drop_invalid_messages, drop_duplicate_messages, drop_nonsequential_messages, parse_feed
+    drop_invalid_messages, drop_duplicate_messages, drop_nonsequential_messages, parse_feed,
+    warn_if_slow_protobuf
 )
 
 
+# The columns of a trip log.
+TRIP_LOG_COLUMNS = [
+    'trip_id', 'route_id', 'action', 'minimum_time', 'maximum_time', 'stop_id', 
+    'latest_information_time'
+]
+
+# The types of the numerical columns in a trip log.
+TRIP_LOG_DTYPES = {
+    'minimum_time': 'float', 'maximum_time': 'float', 'latest_information_time': 'int'
+}
+
+# Mapping from dictionary-encoded GTFS-RT vehicle statuses to human-readable strings.
+VEHICLE_STATUSES = {0: 'INCOMING_AT', 1: 'STOPPED_AT', 2: 'IN_TRANSIT_TO'}
+
+
 ########################
 # INTERMEDIATE PARSERS #
 ########################
@@ -34,88 +51,85 @@ def dictify(buffer):
     Parses a GTFS-Realtime Protobuf into a Python dict, which is more ergonomic to work with.
     Fields not in the GTFS-RT schema are ignored.
     """
+    intern = sys.intern
+    entity = []
     update = {
         'header': {'gtfs_realtime_version': buffer.header.gtfs_realtime_version,
                    'timestamp': buffer.header.timestamp},
-        'entity': []
+        'entity': entity
     }
 
-    # Helper functions for determining GTFS-RT message types.
-    def is_vehicle_update(message):
-        return str(message.trip_update.trip.route_id) == '' and str(message.alert) == ''
-
-    def is_alert(message):
-        return str(message.alert) != ''
-
-    def is_trip_update(message):
-        return not is_vehicle_update(message) and not is_alert(message)
+    # Every attribute access on a Protobuf message goes through the descriptor machinery, which is
+    # far slower than a local variable lookup, so each sub-message is only looked up once.
+    #
+    # The same few hundred stop IDs recur in every update, but Protobuf hands back a new string 
+    # object on every access. Interning them makes every copy of a stop ID the same object, which
+    # saves memory and lets the many stop ID comparisons downstream short-circuit on identity.
+    for message in buffer.entity:
+        # Determine the GTFS-RT message type. Note that calling `str` on a Protobuf sub-message
+        # serializes it to text, which is very slow, so we use the has-bit test instead.
+        if message.HasField('alert'):
+            alert = message.alert
+            entity.append({
+                'id': message.id,
+                'alert': {
+                    'header_text': {
+                        'translation': {
+                            'text': alert.header_text.translation[0].text
+                        }
+                    },
+                    'informed_entity': [
+                        {
+                            'trip_id': _trip.trip.trip_id,
+                            'route_id': _trip.trip.route_id
+                        } for _trip in alert.informed_entity]
+                },
+                'type': 'alert'
+            })
+            continue
 
-    # Helper function for mapping dictionary-encoded statuses into human-readable strings.
-    def munge_status(status_code):
-        statuses = {
-            0: 'INCOMING_AT',
-            1: 'STOPPED_AT',
-            2: 'IN_TRANSIT_TO'
-        }
-        return statuses[status_code]
+        trip_update = message.trip_update
+        trip = trip_update.trip
+        route_id = trip.route_id
 
-    for message in buffer.entity:
-        if is_trip_update(message):
-            parsed_message = {
+        if route_id != '':
+            entity.append({
                 'id': message.id,
                 'trip_update': {
                     'trip': {
-                        'trip_id': message.trip_update.trip.trip_id,
-                        'start_date': message.trip_update.trip.start_date,
-                        'route_id': message.trip_update.trip.route_id
+                        'trip_id': trip.trip_id,
+                        'start_date': trip.start_date,
+                        'route_id': route_id
                     },
                     'stop_time_update': [
                         {
-                            'stop_id': _update.stop_id,
-                            'arrival': np.nan if str(_update.arrival) == "" 
-                                else _update.arrival.time,
-                            'departure': np.nan if str(_update.departure) == "" 
-                                else _update.departure.time
-                        } for _update in message.trip_update.stop_time_update]
+                            'stop_id': intern(_update.stop_id),
+                            'arrival': _update.arrival.time if _update.HasField('arrival')
+                                else np.nan,
+                            'departure': _update.departure.time if _update.HasField('departure')
+                                else np.nan
+                        } for _update in trip_update.stop_time_update]
                 },
                 'type': 'trip_update'
-            }
-            update['entity'].append(parsed_message)
-        elif is_vehicle_update(message):
-            parsed_message = {
+            })
+        else:  # vehicle update
+            vehicle = message.vehicle
+            vehicle_trip = vehicle.trip
+            entity.append({
                 'id': message.id,
                 'vehicle': {
                     'trip': {
-                        'trip_id': message.vehicle.trip.trip_id,
-                        'start_date': message.vehicle.trip.start_date,
-                        'route_id': message.vehicle.trip.route_id
+                        'trip_id': vehicle_trip.trip_id,
+                        'start_date': vehicle_trip.start_date,
+                        'route_id': vehicle_trip.route_id
                     },
-                    'current_stop_sequence': message.vehicle.current_stop_sequence,
-                    'current_status': munge_status(message.vehicle.current_status),
-                    'timestamp': message.vehicle.timestamp,
-                    'stop_id': message.vehicle.stop_id
+                    'current_stop_sequence': vehicle.current_stop_sequence,
+                    'current_status': VEHICLE_STATUSES[vehicle.current_status],
+                    'timestamp': vehicle.timestamp,
+                    'stop_id': intern(vehicle.stop_id)
                 },
                 'type': 'vehicle_update'
-            }
-            update['entity'].append(parsed_message)
-        else:  # is_alert
-            parsed_message = {
-                'id': message.id,
-                'alert': {
-                    'header_text': {
-                        'translation': {
-                            'text': message.alert.header_text.translation[0].text
-                        }
-                    },
-                    'informed_entity': [
-                        {
-                            'trip_id': _trip.trip.trip_id,
-                            'route_id': _trip.trip.route_id
-                        } for _trip in message.alert.informed_entity]
-                },
-                'type': 'alert'
-            }
-            update['entity'].append(parsed_message)
+            })
 
     return update
 
@@ -124,79 +138,97 @@ def actionify(trip_message, vehicle_message, timestamp):
     """
     Parses the trip update and vehicle update messages (if there is one; may be None) for a 
     particular trip into an action log.
+
+    The ``time_assigned`` column holds the (numeric) times given in the feed, and is NaN where the
+    feed does not give a time.
+    """
+    return _action_log_from_rows(actionify_rows(trip_message, vehicle_message, timestamp))
+
+
+def actionify_rows(trip_message, vehicle_message, timestamp):
+    """
+    Parses the trip update and vehicle update messages (if there is one; may be None) for a 
+    particular trip into a list of action log rows. Building a single action log out of many of
+    these lists is much faster than concatenating many small action logs together.
+
+    Implementation detail of `actionify`.
     """
     # If a vehicle message is not None, the trip is already in progress.
     inp = vehicle_message is not None
 
     # The base of the log entry is the same for all possible entries.
-    base = np.array([trip_message['trip_update']['trip']['trip_id'],
-                     trip_message['trip_update']['trip']['route_id'], timestamp])
+    trip_update = trip_message['trip_update']
+    trip_id = trip_update['trip']['trip_id']
+    route_id = trip_update['trip']['route_id']
     vehicle_status = vehicle_message['vehicle']['current_status'] if inp else 'QUEUED'
     loglist = []
 
-    def log_arrival(stop_id, arrival_time):
-        loglist.append(
-            np.append(base.copy(), np.array(['EXPECTED_TO_ARRIVE_AT', stop_id, arrival_time]))
-        )
-
-    def log_departure(stop_id, departure_time):
-        loglist.append(
-            np.append(base.copy(), np.array(['EXPECTED_TO_DEPART_AT', stop_id, departure_time]))
-        )
-
-    def log_stop(stop_id, arrival_time):
-        loglist.append(
-            np.append(base.copy(), np.array(['STOPPED_AT', stop_id, arrival_time]))
-        )
-
-    def log_skip(stop_id, skip_time):
-        loglist.append(
-            np.append(base.copy(), np.array(['EXPECTED_TO_SKIP', stop_id, skip_time]))
-        )
+    # The vehicle status is the same for every stop, so resolve the status checks once, up front.
+    is_stopped = vehicle_status == 'STOPPED_AT'
+    is_queued = vehicle_status == 'QUEUED'
+    is_in_transit = vehicle_status in ('IN_TRANSIT_TO', 'INCOMING_AT')
 
-    for s_i, stop_time_update in enumerate(trip_message['trip_update']['stop_time_update']):
+    # Rows are appended inline rather than through per-action helper functions; this loop runs for
+    # every stop of every trip in every feed, so the function call overhead adds up.
+    append = loglist.append
+    stop_time_updates = trip_update['stop_time_update']
+    last_s_i = len(stop_time_updates) - 1
 
-        first_station = s_i == 0
-        last_station = s_i == len(trip_message['trip_update']['stop_time_update']) - 1
+    for s_i, stop_time_update in enumerate(stop_time_updates):
         stop_id = stop_time_update['stop_id']
         arrival_time = stop_time_update['arrival']
         departure_time = stop_time_update['departure']
 
+        # Times are either ints or NaN, and NaN is the only value not equal to itself. This is
+        # much cheaper than calling `pd.isnull` on every stop.
+        has_arrival = arrival_time == arrival_time
+        has_departure = departure_time == departure_time
+
+        # Intermediate station. Stations in the middle of the route do not depend on the vehicle
+        # status, and are by far the most common case, so they are checked first.
+        if 0 < s_i < last_s_i:
+            # Both arrival and departure fields are non-null.
+            if has_arrival and has_departure:
+                append((trip_id, route_id, timestamp, 'EXPECTED_TO_ARRIVE_AT', stop_id,
+                        arrival_time))
+                append((trip_id, route_id, timestamp, 'EXPECTED_TO_DEPART_AT', stop_id,
+                        departure_time))
+            # One of arrival or departure is null.
+            else:
+                append((trip_id, route_id, timestamp, 'EXPECTED_TO_SKIP', stop_id,
+                        arrival_time if has_arrival else departure_time))
+
+        # Last station, not also the first (e.g. not length 1).
+        elif s_i != 0:
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_ARRIVE_AT', stop_id,
+                    arrival_time))
+
         # First station, vehicle status is STOPPED_AT.
-        if first_station and vehicle_status == 'STOPPED_AT':
-            log_stop(stop_id, arrival_time)
+        elif is_stopped:
+            append((trip_id, route_id, timestamp, 'STOPPED_AT', stop_id, arrival_time))
 
         # First station, vehicle status is QUEUED.
-        elif first_station and vehicle_status == 'QUEUED':
-            log_departure(stop_id, departure_time)
+        elif is_queued:
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_DEPART_AT', stop_id,
+                    departure_time))
 
         # First station, vehicle status is IN_TRANSIT_TO or INCOMING_AT, both arrival and 
         # departure fields are non-null.
-        # Intermediate station, both arrival and departure fields are non-null.
-        elif ((first_station and
-               vehicle_status in ['IN_TRANSIT_TO', 'INCOMING_AT'] and
-               pd.notnull(arrival_time) and pd.notnull(departure_time)) or
-
-              (not first_station and
-               not last_station and
-               pd.notnull(arrival_time) and pd.notnull(departure_time))):
-
-            log_arrival(stop_id, arrival_time)
-            log_departure(stop_id, departure_time)
+        elif is_in_transit and has_arrival and has_departure:
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_ARRIVE_AT', stop_id,
+                    arrival_time))
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_DEPART_AT', stop_id,
+                    departure_time))
 
-        # Not the last station, one of arrival or departure is null.
-        elif ((not last_station and
-               (pd.isnull(arrival_time) or pd.isnull(departure_time)))):
-            log_skip(stop_id, departure_time) if pd.isnull(arrival_time)\
-                else log_skip(stop_id, arrival_time)
-
-        # Last station, not also the first (e.g. not length 1).
-        elif last_station and not first_station:
-            log_arrival(stop_id, arrival_time)
+        # First station, not also the last, one of arrival or departure is null.
+        elif s_i != last_s_i and not (has_arrival and has_departure):
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_SKIP', stop_id,
+                    arrival_time if has_arrival else departure_time))
 
         # Last station, also first station, vehicle status is IN_TRANSIT_TO or INCOMING_AT.
-        elif last_station and vehicle_status in ['IN_TRANSIT_TO', 'INCOMING_AT']:
-            log_arrival(stop_id, arrival_time)
+        elif is_in_transit:
+            append((trip_id, route_id, timestamp, 'EXPECTED_TO_ARRIVE_AT', stop_id,
+                    arrival_time))
 
         # This shouldn't occur, and indicates an error in the input or our logic.
         else:
@@ -205,12 +237,18 @@ def actionify(trip_message, vehicle_message, timestamp):
                 "to invalid input."
             )
 
+    return loglist
+
+
+def _action_log_from_rows(loglist):
+    """
+    Builds an action log out of a list of action log rows, as returned by `actionify_rows`.
+    """
     action_log = pd.DataFrame(
         loglist, 
         columns=['trip_id', 'route_id', 'information_time', 'action', 'stop_id','time_assigned']
     )
-    # base is a single-typed numpy array which converts the information_time input to dtype `U<14`
-    # so we have to convert it back before returning
+    # information_time is left untyped when the log is empty, so we have to set it explicitly
     action_log = action_log.assign(information_time=action_log.information_time.astype(int))
     return action_log
 
@@ -227,26 +265,60 @@ def tripify(tripwise_action_logs, finished=False, finish_information_time=None):
     disappears from the GTFS-R feed, The information time of the first GTFS-R feed *not* 
     containing this trip, an externality, is the relevant piece of information.
     """
+    lines, timestamps = tripify_rows(tripwise_action_logs)
+
+    # The trip log returned here is string-typed. Converting all of the lines at once is much 
+    # cheaper than building a string array for each line.
+    trip = pd.DataFrame(np.array(lines, dtype=str), columns=TRIP_LOG_COLUMNS)
+
+    if finished:
+        assert finish_information_time
+        trip = finish_trip(trip, finish_information_time)
+
+    return trip, timestamps
+
+
+def tripify_rows(tripwise_action_logs, route_cache=None):
+    """
+    Given a list of action logs associated with a particular trip, returns the list of trip log 
+    rows resulting from their merger, along with the trip's information times. `logify` builds 
+    typed trip logs straight out of these rows, which is much cheaper than parsing the numbers 
+    back out of the string-typed trip log returned by `tripify`. `route_cache` is passed on to 
+    `synthesize_route`.
+
+    Implementation detail of `tripify`.
+    """
+    # Work on the action log columns as plain arrays: concatenating, deduplicating, and sorting 
+    # whole frames costs far more than the handful of values we actually need.
+    def column(name):
+        return np.concatenate([log[name].values for log in tripwise_action_logs])
+
+    all_information_times = column('information_time')
 
     # Capture the first row of information for each information time. `key_data` may contain 
     # skipped stops! We have to iterate through `remaining_stops` and `key_data` simultaneously 
-    # to get what we want.
-    all_data = pd.concat(tripwise_action_logs)
-    key_data = (all_data
-                .groupby('information_time')
-                .first()
-                .reset_index())
-    timestamps = key_data.information_time.values.tolist()
+    # to get what we want. `np.unique` returns the information times in sorted order, along with 
+    # the position of the first row for each of them.
+    key_information_times, key_idxs = np.unique(all_information_times, return_index=True)
+    timestamps = key_information_times.tolist()
 
     # Get the complete (synthetic) stop list.
-    stops = synthesize_route([list(log['stop_id'].unique()) for log in tripwise_action_logs])
+    stops = synthesize_route([list(pd.unique(log['stop_id'].values))
+                              for log in tripwise_action_logs], route_cache)
 
     # Get the complete list of information times.
-    information_times = [np.nan] + list(all_data['information_time'].unique()) + [np.nan]
+    information_times = [np.nan] + list(pd.unique(all_information_times)) + [np.nan]
 
     # Init lines, where we will concat our final result, and the base (trip_id, route_id) to be 
-    # written to it.
-    base = np.array([key_data.iloc[0]['trip_id'], key_data.iloc[0]['route_id']])
+    # written to it. These are read straight out of the action log holding the first key row, 
+    # rather than out of whole concatenated columns.
+    first_key_idx = key_idxs[0]
+    for first_log in tripwise_action_logs:
+        if first_key_idx < len(first_log):
+            break
+        first_key_idx -= len(first_log)
+    trip_id = first_log['trip_id'].iat[first_key_idx]
+    route_id = first_log['route_id'].iat[first_key_idx]
     lines = []
 
     # Key data index pointers.
@@ -258,32 +330,40 @@ def tripify(tripwise_action_logs, finished=False, finish_information_time=None):
     passed_stops = set()
     most_recent_passed_stop = None
 
-    while kd_i < len(key_data) and st_i < len(stops):
+    # Pull the key data columns out into plain lists up front, as indexing into arrays on every
+    # step of the merge is very slow.
+    kd_stop_ids = column('stop_id')[key_idxs].tolist()
+    # Only whether or not each key record is a stop matters, so compare the action strings all at 
+    # once instead of once per step.
+    kd_is_stopped = (column('action')[key_idxs] == 'STOPPED_AT').tolist()
+    n_kd, n_st = len(kd_stop_ids), len(stops)
+
+    while kd_i < n_kd and st_i < n_st:
         next_stop = stops[st_i]
-        next_record = key_data.iloc[kd_i]
+        next_record_stop_id = kd_stop_ids[kd_i]
 
-        if next_record['stop_id'] != next_stop and next_record['stop_id'] not in passed_stops:
-            skipped_stop = np.append(base.copy(), np.array(
-                ['STOPPED_OR_SKIPPED', information_times[it_i - 1], 
-                 information_times[it_i], next_stop, information_times[it_i]]
-            ))
+        if next_record_stop_id != next_stop and next_record_stop_id not in passed_stops:
+            skipped_stop = [
+                trip_id, route_id, 'STOPPED_OR_SKIPPED', information_times[it_i - 1],
+                information_times[it_i], next_stop, information_times[it_i]
+            ]
             lines.append(skipped_stop)
             passed_stops.add(next_stop)
             most_recent_passed_stop = next_stop
 
             st_i += 1
 
-        elif (next_record['stop_id'] != next_stop and 
-              next_record['stop_id'] == most_recent_passed_stop):
+        elif (next_record_stop_id != next_stop and 
+              next_record_stop_id == most_recent_passed_stop):
             lines[-1][4] = information_times[it_i + 1]
             it_i += 1
             kd_i += 1
 
-        elif next_record['stop_id'] == next_stop and next_record['action'] == 'STOPPED_AT':
-            stopped_stop = np.append(base.copy(), np.array(
-                ['STOPPED_AT', information_times[it_i - 1], information_times[it_i + 1],
-                 next_stop, information_times[it_i]]
-            ))
+        elif next_record_stop_id == next_stop and kd_is_stopped[kd_i]:
+            stopped_stop = [
+                trip_id, route_id, 'STOPPED_AT', information_times[it_i - 1],
+                information_times[it_i + 1], next_stop, information_times[it_i]
+            ]
             lines.append(stopped_stop)
             passed_stops.add(next_stop)
             most_recent_passed_stop = next_stop
@@ -292,7 +372,7 @@ def tripify(tripwise_action_logs, finished=False, finish_information_time=None):
             kd_i += 1
             st_i += 1
 
-        # next_record['stop_id'] == next_stop and next_record['action'] == 'EXPECTED_TO_ARRIVE_AT':
+        # next_record_stop_id == next_stop and the key record is 'EXPECTED_TO_ARRIVE_AT':
         else:
             it_i += 1
             kd_i += 1
@@ -301,22 +381,26 @@ def tripify(tripwise_action_logs, finished=False, finish_information_time=None):
     latest_information_time = int(information_times[-2])
 
     for remaining_stop in [stop for stop in stops if stop not in passed_stops]:
-        future_stop = np.append(base.copy(), np.array(
-            ['EN_ROUTE_TO', latest_information_time, np.nan,
-             remaining_stop, latest_information_time]
-        ))
+        future_stop = [
+            trip_id, route_id, 'EN_ROUTE_TO', latest_information_time, np.nan,
+            remaining_stop, latest_information_time
+        ]
         lines.append(future_stop)
 
-    trip = pd.DataFrame(lines, columns=[
-        'trip_id', 'route_id', 'action', 'minimum_time', 'maximum_time', 'stop_id', 
-        'latest_information_time'
-    ])
+    return lines, timestamps
 
-    if finished:
-        assert finish_information_time
-        trip = finish_trip(trip, finish_information_time)
 
-    return trip, timestamps
+def _trip_log_from_rows(lines):
+    """
+    Builds a typed trip log out of a list of trip log rows, as returned by `tripify_rows`.
+    """
+    # Build each column directly at its final type. Letting pandas infer the column types from the
+    # rows, or going through strings as `tripify` does, is several times slower.
+    columns = list(zip(*lines)) or [()] * len(TRIP_LOG_COLUMNS)
+    return pd.DataFrame({
+        name: np.array(column, dtype=TRIP_LOG_DTYPES.get(name, object))
+        for name, column in zip(TRIP_LOG_COLUMNS, columns)
+    })
 
 
 ###############
@@ -343,20 +427,41 @@ def collate_update(update, include_alerts=False):
     if include_alerts:
         raise NotImplementedError
 
-    # initially build a dict keyed in trip_id
-    keymap = defaultdict(dict)
+    # build a dict keyed in trip_id, filling in the default fields on first insertion
+    ts = update['header']['timestamp']
+    keymap = dict()
 
     for message in update['entity']:
-        if message['type'] == 'alert':
+        message_type = message['type']
+        if message_type == 'alert':
             continue
-        if message['type'] == 'trip_update':
+
+        # vehicle updates may precede their trip updates, so each message is keyed on its own
+        # trip_id
+        if message_type == 'trip_update':
             trip_id = message['trip_update']['trip']['trip_id']
-            keymap[trip_id]['trip_update'] = message
-        elif message['type'] == 'vehicle_update':
-            keymap[trip_id]['vehicle_update'] = message
+        else:  # message_type == 'vehicle_update'
+            trip_id = message['vehicle']['trip']['trip_id']
+
+        if trip_id not in keymap:
+            keymap[trip_id] = {'vehicle_update': None, 'timestamp': ts}
+        keymap[trip_id][message_type] = message
+
+    # a vehicle update without a corresponding trip update carries no stop information, so it
+    # cannot be processed further. `drop_invalid_messages` records these as parse errors, so this
+    # only happens when the updates were not pre-processed; warn, so the loss isn't silent
+    vehicle_update_only_ids = [
+        trip_id for trip_id in keymap if 'trip_update' not in keymap[trip_id]
+    ]
+    if len(vehicle_update_only_ids) > 0:
+        warnings.warn(
+            f"The GTFS-RT update for {ts} contains vehicle updates with no corresponding trip "
+            f"update, for the following trip IDs: {', '.join(vehicle_update_only_ids)}. These "
+            f"messages were ignored."
+        )
+    for trip_id in vehicle_update_only_ids:
+        del keymap[trip_id]
 
-    ts = update['header']['timestamp']
-    keymap = {key: {'vehicle_update': None, 'timestamp': ts, **keymap[key]} for key in keymap}
     return keymap
 
 
@@ -380,7 +485,8 @@ def collate(updates, include_alerts=False):
     which handles collocation *within* an update, whilst this method handles collocation *between*
     updates.
 
-    This method calculates a UUID for the `unique_trip_id`.
+    This method calculates the `unique_trip_id` by combining the `trip_id` with the timestamp of
+    the first update the trip appears in.
     """
     if include_alerts:
         raise NotImplementedError("Processing alert messages has not been implemented yet.")
@@ -389,38 +495,32 @@ def collate(updates, include_alerts=False):
         return []
 
     update_keymaps = [collate_update(update, include_alerts=include_alerts) for update in updates]
-    all_trip_ids = set()
-    for update_keymap in update_keymaps:
-        all_trip_ids.update(set(update_keymap.keys()))
-    all_trip_ids = list(all_trip_ids)
-
-    # Build a boolean matrix whose x_dim is trip_id and whose y_dim is time (update sequence 
-    # number).
-    containment_matrix = np.vstack(
-        [np.isin(all_trip_ids, list(update_keymap.keys())) for update_keymap in update_keymaps]
-    )
 
-    # Parse the containment matrix to deduplicate trips with the same trip_id. E.g.:
-    #   $TRIP_ID: [True, True, True, False] -> one trip
-    #   $TRIP_ID: [True, True, False, True] -> two trips
+    # Build a map whose keys are trip_id values and whose values are the (sorted) update
+    # sequence numbers that trip_id appears in.
+    appearances = defaultdict(list)
+    for sequence_number, update_keymap in enumerate(update_keymaps):
+        for trip_id in update_keymap:
+            appearances[trip_id].append(sequence_number)
+
+    # Split each sequence into runs of consecutive updates to deduplicate trips with the same
+    # trip_id. E.g.:
+    #   $TRIP_ID: [0, 1, 2] -> one trip
+    #   $TRIP_ID: [0, 1, 3] -> two trips
+    #
+    # Each run is keyed on a stopgap ID which only needs to be unique within this method, so a
+    # simple counter suffices.
     interim = defaultdict(list)
+    run_ids = itertools.count()
 
-    for j in range(len(all_trip_ids)):
-        previous_value = False
-        current_unique_trip_id = str(uuid.uuid1())
-        trip_id, trip_id_time_slice = all_trip_ids[j], containment_matrix[:, j]
-
-        for sequence_number, entry in enumerate(trip_id_time_slice):
-            if entry and previous_value is True:
-                interim[current_unique_trip_id].append(update_keymaps[sequence_number][trip_id])
-            elif entry and previous_value is False:
-                previous_value = True
-                current_unique_trip_id = str(uuid.uuid1())
-                interim[current_unique_trip_id].append(update_keymaps[sequence_number][trip_id])
-            elif not entry and previous_value is True:
-                previous_value = False
-            else:
-                continue
+    for trip_id, sequence_numbers in appearances.items():
+        previous_sequence_number = None
+
+        for sequence_number in sequence_numbers:
+            if previous_sequence_number is None or sequence_number != previous_sequence_number + 1:
+                current_unique_trip_id = next(run_ids)
+            interim[current_unique_trip_id].append(update_keymaps[sequence_number][trip_id])
+            previous_sequence_number = sequence_number
 
     # combine trips, as indexed by trip_id, that that are "obviously" (hueristically) the same
     # trip:
@@ -435,6 +535,12 @@ def collate(updates, include_alerts=False):
     at_least_one_match_found = True
     complete_trips = set()
 
+    # map each update timestamp to the (first) position it appears at in the update sequence
+    timestamp_sequence = [u['header']['timestamp'] for u in updates]
+    timestamp_positions = dict()
+    for position, timestamp in enumerate(timestamp_sequence):
+        timestamp_positions.setdefault(timestamp, position)
+
     while at_least_one_match_found:
         st_map = dict()
         updated_interim = dict()
@@ -455,7 +561,6 @@ def collate(updates, include_alerts=False):
                 st_map[route_id] = {start_timestamp: [uid]}
 
         # then analyzing those potential matches one-by-one in detail
-        timestamp_sequence = [u['header']['timestamp'] for u in updates]
         for uid in interim:
             if uid in complete_trips:
                 # a trip lands in complete_trips IFF an earlier iteration of this loop did not
@@ -468,20 +573,19 @@ def collate(updates, include_alerts=False):
             route_id = interim[uid][0]['trip_update']['trip_update']['trip']['route_id']
             last_timestamp = interim[uid][-1]['timestamp']
 
-            end_index = timestamp_sequence.index(last_timestamp) + 1
+            end_index = timestamp_positions[last_timestamp] + 1
             if end_index >= len(timestamp_sequence):
                 continue  # the trip never terminated so we are done
 
-            end_timestamp = timestamp_sequence[
-                timestamp_sequence.index(last_timestamp) + 1
-            ]
+            end_timestamp = timestamp_sequence[end_index]
             if end_timestamp not in st_map[route_id]:
                 continue  # no other trips on this route started at this time so we are done
 
-            possible_matches = set(st_map[route_id][end_timestamp]).difference(already_merged)
+            current_first_remaining_stop = interim[uid][-1]['trip_update']['trip_update']\
+                ['stop_time_update'][0]['stop_id']
+            possible_matches = [candidate_uid for candidate_uid in st_map[route_id][end_timestamp]
+                                if candidate_uid not in already_merged]
             for candidate_uid in possible_matches:
-                current_first_remaining_stop = interim[uid][-1]['trip_update']['trip_update']\
-                    ['stop_time_update'][0]['stop_id']
                 candidate_initial_stop = interim[candidate_uid][0]['trip_update']\
                     ['trip_update']['stop_time_update'][0]['stop_id']
 
@@ -498,7 +602,7 @@ def collate(updates, include_alerts=False):
                     else:
                         updated_interim[uid] = interim[uid] + interim[candidate_uid]
 
-                    already_merged.update({candidate_uid})
+                    already_merged.add(candidate_uid)
                     break
 
         for uid in interim:
@@ -508,9 +612,8 @@ def collate(updates, include_alerts=False):
 
         interim = out = updated_interim
 
-    # The ID generated by collate thus far is a uuid value which is time and machine dependent,
-    # but is convenient as a stopgap value. Our next step is to switch to using a uniqified
-    # version of the true trip_id.
+    # The ID generated by collate thus far is a run counter, which is convenient as a stopgap
+    # value. Our next step is to switch to using a uniqified version of the true trip_id.
     for key in list(out.keys()):
         trip_id = out[key][0]['trip_update']['trip_update']['trip']['trip_id']
         timestamp = out[key][0]['timestamp']
@@ -545,57 +648,70 @@ def logify(updates):
     corruption) discovered while building the logbook. For a reference on parse error types refer
     to the corresponding section of the online documentation:
     https://residentmario.github.io/gtfs-tripify/parse_errors.html.
+
+    Parse errors are grouped by the step which raised them, in order: errors parsing updates into
+    Protobufs, invalid messages, duplicate updates, and then non-sequential updates. Within each
+    group they are in update order. ``parse_errors`` is None if the input is already parsed.
     """
     # trivial case
     if updates == []:
         return dict(), dict(), None
 
     def _parse_message_list_into_action_logs(message_collection, timestamps):
-        action_logs = []
+        # Build a single action log for the whole trip, then slice it back up into per-message
+        # action logs. This is much faster than building each action log separately.
+        loglist, bounds = [], [0]
         for message, timestamp in zip(message_collection, timestamps):
             trip_update = message['trip_update']
             vehicle_update = message['vehicle_update']
-            actions = actionify(trip_update, vehicle_update, timestamp)
-            action_logs.append(actions)
-        return action_logs
+            loglist.extend(actionify_rows(trip_update, vehicle_update, timestamp))
+            bounds.append(len(loglist))
+        action_log = _action_log_from_rows(loglist)
+        return [action_log.iloc[start:stop] for start, stop in zip(bounds[:-1], bounds[1:])]
 
     # Accept either raw Protobuf updates or already-parsed dict updates.
     already_parsed = isinstance(updates[0], dict)
     parse_errors = None if already_parsed else []
     if not already_parsed:
-        # step 1: bytes -> protobufs
-        protobufs = []
+        warn_if_slow_protobuf()
+
+        # steps 1-3: bytes -> protobufs -> dicts -> cleaned-up dicts
+        # Each update is carried through all three steps before the next one is read, so only one
+        # parsed Protobuf is held in memory at a time. The errors from step 3 are held back until
+        # every update has been parsed, so that parse errors stay grouped by step.
+        clean_updates = []
+        drop_invalid_parse_errors = []
         for update in updates:
+            # step 1: bytes -> protobuf
             try:
                 protobuf = parse_feed(update)
-                if protobuf is None:  # an unsafe Protobuf parse
-                    parse_errors.append({
-                        'type': 'parsing_into_protobuf_raised_runtime_warning'
-                    })
-                else:
-                    protobufs.append(protobuf)
             except (SystemExit, KeyboardInterrupt) as e:
                 raise e
             except:  # an erroneous Protobuf parse
                 parse_errors.append({
                     'type': 'parsing_into_protobuf_raised_exception'
                 })
-        del updates
+                continue
+            if protobuf is None:  # an unsafe Protobuf parse
+                parse_errors.append({
+                    'type': 'parsing_into_protobuf_raised_runtime_warning'
+                })
+                continue
 
-        # step 2: protobufs -> dicts
-        # Since the Protobuf parser should raise for major GTFS-RT schema violations, this method
-        # can only raise in the case of a logic fault in the code, not in the data, so we do not
-        # intercept errors here.
-        update_dicts = [dictify(protobuf) for protobuf in protobufs]
-        del protobufs
+            # step 2: protobuf -> dict
+            # Since the Protobuf parser should raise for major GTFS-RT schema violations, this 
+            # method can only raise in the case of a logic fault in the code, not in the data, so
+            # we do not intercept errors here.
+            update = dictify(protobuf)
+            del protobuf
 
-        # step 3: dicts -> cleaned-up dicts
-        clean_updates = []
-        for update in update_dicts:
-            update, drop_invalid_parse_errors = drop_invalid_messages(update)
-            parse_errors += drop_invalid_parse_errors
+            # step 3: dict -> cleaned-up dict
+            update, update_parse_errors = drop_invalid_messages(update)
+            drop_invalid_parse_errors += update_parse_errors
             clean_updates.append(update)
-        del update_dicts
+        del updates
+
+        parse_errors += drop_invalid_parse_errors
 
         # step 4: dict feed -> deduplicated dict feed with known good timestamps
         clean_deduped_updates, drop_duplicate_messages_parse_errors =\
@@ -621,6 +737,10 @@ def logify(updates):
     logbook = dict()
     timestamps = dict()
 
+    # Trips on the same route share station list histories, so their routes are only synthesized
+    # once. The cache is dropped along with the rest of the call's state.
+    route_cache = dict()
+
     for unique_trip_id in message_collections:
         message_collection = message_collections[unique_trip_id]
         message_timestamps = [message['timestamp'] for message in message_collection]
@@ -631,13 +751,8 @@ def logify(updates):
         action_logs = _parse_message_list_into_action_logs(
             message_collection, message_timestamps
         )
-        trip_log, trip_timestamps = tripify(action_logs)
-        # TODO: is this necessary? Coerce types.
-        trip_log = trip_log.assign(
-            minimum_time=trip_log.minimum_time.astype('float'),
-            maximum_time=trip_log.maximum_time.astype('float'),
-            latest_information_time=trip_log.latest_information_time.astype('int')
-        )
+        lines, trip_timestamps = tripify_rows(action_logs, route_cache)
+        trip_log = _trip_log_from_rows(lines)
 
         # If the trip was terminated sometime in the course of these feeds, update the trip log
         if trip_terminated:
@@ -3,24 +3,61 @@ Library utility functions.
 """
 
 import itertools
-import tarfile
-import os
+import functools
 import datetime
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import requests
 
 
-def synthesize_route(station_lists):
+ARCHIVE_BUFSIZE = 1 << 20
+POOL_SIZE = 16
+REQUEST_TIMEOUT = 30
+FINISHED_ACTIONS = {'EN_ROUTE_TO': 'STOPPED_OR_SKIPPED', 'EXPECTED_TO_SKIP': 'STOPPED_OR_SKIPPED'}
+
+
+def synthesize_route(station_lists, cache=None):
     """
     Given a list of station lists (that is: a list of lists, where each sublist consists of the
     series of stations which a train was purported to be heading towards at any one time), 
     returns the synthetic route of all of the stops that train may have stopped at, in the order
     in which those stops would have occurred.
+
+    Trips on the same route tend to see the exact same sequence of station lists. If a dict is 
+    passed as the ``cache``, syntheses are memoized in it, keyed on the station list history. The 
+    keys can be large, so the cache should only live as long as the batch of trips it is used 
+    for: ``logify`` and ``merge_logbooks`` each use a fresh one for the duration of a call.
+    """
+    # A station list usually only changes when the train moves or is rerouted, so most of the 
+    # history is runs of repeats. Merging a list without repeated stations into the result of 
+    # merging that same list is a no-op, so those runs can be collapsed.
+    history = []
+    for station_list in station_lists:
+        station_list = tuple(station_list)
+        if (history and station_list == history[-1] and
+                len(set(station_list)) == len(station_list)):
+            continue
+        history.append(station_list)
+
+    history = tuple(history)
+    if cache is None:
+        return _synthesize_route(history)
+
+    route = cache.get(history)
+    if route is None:
+        route = cache[history] = tuple(_synthesize_route(history))
+    return list(route)
+
+
+def _synthesize_route(station_lists):
+    """
+    Implementation of the above. Takes a tuple of station tuples.
     """
     ret = []
-    for i in range(len(station_lists)):
-        ret = _synthesize_station_lists(ret, station_lists[i])
+    for station_list in station_lists:
+        _merge_into(ret, station_list)
     return ret
 
 
@@ -28,32 +65,47 @@ def _synthesize_station_lists(left, right):
     """
     Pairwise synthesis op. Submethod of the above.
     """
-    # First, find the pivot.
+    ret = list(left)
+    _merge_into(ret, right)
+    return ret
+
+
+def _merge_into(ret, right):
+    """
+    In-place variant of the pairwise synthesis op: merges the station list `right` into the 
+    station list `ret`, mutating `ret`.
+    """
+    # First, find the pivot: the last station in the first list which also appears in the second
+    # list, matched against its first appearance in the second list.
+    right_idxs = dict()
+    for k, station in enumerate(right):
+        right_idxs.setdefault(station, k)
+
     pivot_left = pivot_right = -1
-    for j in range(len(left)):
-        station_a = left[j]
-        for k in range(len(right)):
-            station_b = right[k]
-            if station_a == station_b:
-                pivot_left = j
-                pivot_right = k
-                break
+    for j in range(len(ret) - 1, -1, -1):
+        k = right_idxs.get(ret[j])
+        if k is not None:
+            pivot_left, pivot_right = j, k
+            break
 
     # If we found a pivot...
     if pivot_left != -1:
         # ...then the stations that appear before the pivot in the first list, the pivot, and 
         # the stations that appear after the pivot in the second list should be the ones that 
-        # are included
-        return (left[:pivot_left] +
-                [s for s in right[:pivot_right] if s not in left[:pivot_left]] +
-                right[pivot_right:])
+        # are included. The first list's prefix is already in place, so only the tail needs to 
+        # be overwritten.
+        left_prefix_stations = dict.fromkeys(itertools.islice(ret, pivot_left))
+        ret[pivot_left:] = [
+            s for s in itertools.islice(right, pivot_right) if s not in left_prefix_stations
+        ]
+        ret.extend(itertools.islice(right, pivot_right, None))
     # If we did not find a pivot...
     else:
         # ...then none of the stations that appear in the second list appeared in the first 
         # list. This means that the train probably cancelled those stations, but it may have 
         # stopped there in the meantime also. Add all stations in the first list and all 
         # stations in the second list together.
-        return left + right
+        ret.extend(right)
 
 
 def finish_trip(trip_log, timestamp):
@@ -61,11 +113,41 @@ def finish_trip(trip_log, timestamp):
     Finishes a trip. We know a trip is finished when its messages stops appearing in feed files,
     at which time we can "cross out" any stations still remaining.
     """
-    trip_log = (trip_log.replace('EN_ROUTE_TO', 'STOPPED_OR_SKIPPED')
-                        .replace('EXPECTED_TO_SKIP', 'STOPPED_OR_SKIPPED')
-                        .replace('nan', np.nan))
-    trip_log['maximum_time'] = trip_log['maximum_time'].fillna(timestamp)
-    return trip_log
+    # Only the action column holds action names, and only the time columns can hold the 'nan' 
+    # sentinel (when the log is still string-typed), so there is no need to scan the rest.
+    return trip_log.assign(
+        action=trip_log['action'].replace(FINISHED_ACTIONS),
+        minimum_time=trip_log['minimum_time'].replace('nan', np.nan),
+        maximum_time=trip_log['maximum_time'].replace('nan', np.nan).fillna(timestamp)
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _session():
+    """
+    Returns the session shared by the archive loaders. Archived feeds are usually fetched many at 
+    a time, so connections to the archive are kept alive between requests (and between calls) 
+    instead of paying for a new TCP and TLS handshake every time.
+
+    The session is shared by the threads of ``load_mta_archived_feeds``. ``requests`` does not 
+    guarantee that sessions are thread-safe, but the loaders only ever issue plain GET requests on 
+    it, and never modify its state (cookies, headers, or adapters) after it is built. Connections 
+    are checked out of urllib3's thread-safe pool, which holds up to ``POOL_SIZE`` of them per 
+    host, one for each worker.
+
+    ``requests`` is only needed by the loaders, and is comparatively slow to import, so it is 
+    imported here rather than at the top of the module.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    session = requests.Session()
+    for prefix in ['https://', 'http://']:
+        session.mount(prefix, HTTPAdapter(
+            pool_maxsize=POOL_SIZE, max_retries=Retry(total=3, backoff_factor=0.2)
+        ))
+    return session
 
 
 # TODO: use a datetime as input instead of a string, as in `load_mytransit_archived_feeds`
@@ -83,40 +165,82 @@ def load_mta_archived_feed(feed='gtfs', timestamp='2014-09-17-09-31'):
         06, 11, 16, 21, 26, 31, 36, 41, 46, 51, and 56 minutes after the hour, so only these 
         times will be valid.
     """
-    return requests.get(
-        "https://datamine-history.s3.amazonaws.com/{0}-{1}".format(feed, timestamp)
+    return _session().get(
+        "https://datamine-history.s3.amazonaws.com/{0}-{1}".format(feed, timestamp),
+        timeout=REQUEST_TIMEOUT
     )
 
 
+def load_mta_archived_feeds(feed='gtfs', timestamps=('2014-09-17-09-31',)):
+    """
+    Returns archived GTFS data for a sequence of time_assigned values, in the order given. The 
+    downloads are performed concurrently, on a pool of ``POOL_SIZE`` threads which share a single 
+    keep-alive session (see ``_session``).
+
+    Unlike ``load_mta_archived_feed``, an unsuccessful download raises (an ``HTTPError``, in the 
+    case of an error response) instead of being returned, as a single missing feed would otherwise 
+    be easy to miss in a long sequence of them.
+
+    Parameters
+    ----------
+    feed: {'gtfs', 'gtfs-l', 'gtfs-si'}
+        Archival data is provided in these three rollups. See ``load_mta_archived_feed``.
+    timestamps: list of str
+        The time_assigned values associated with the data rollups. See 
+        ``load_mta_archived_feed`` for which times are valid.
+    """
+    def load(timestamp):
+        resp = load_mta_archived_feed(feed, timestamp)
+        resp.raise_for_status()
+        return resp
+
+    _session()  # set up the shared session once, before the workers start racing for it
+    with ThreadPoolExecutor(max_workers=POOL_SIZE) as executor:
+        return list(executor.map(load, timestamps))
+
+
 def load_mytransit_archived_feeds(timestamp=datetime.datetime(2017, 1, 1, 12, 0)):
     """
     Given a timestamp, loads a roundup of minutely MTA feeds for that day. The data is returned 
     as a list of `ExFileObject` virtual files (use `read` to get raw bytes).
 
+    The virtual files are read lazily, out of a temporary copy of the (compressed) archive, which
+    is deleted once they have all been garbage collected. An xz archive can only be decompressed
+    front to back, so reading the files in archive order decompresses the archive once more, but
+    reading a file which comes before the last one read decompresses the archive all over again,
+    from the start.
+
     This data is loaded from Nathan Johnson's data.transit.nyc archiving project 
     (http://data.mytransit.nyc/). His archive is a complete record of the data from January 31st, 
     2016 through May 31st, 2017.
     """
-    ts = timestamp
-    uri = (
-        f"http://data.mytransit.nyc.s3.amazonaws.com/subway_time/{ts.year}/{ts.year}-"
-        f"{str(ts.month).rjust(2, '0')}/subway_time_"
-        f"{str(ts.year) + str(ts.month).rjust(2, '0') + str(ts.day).rjust(2, '0')}.tar.xz"
+    import tarfile
+
+    uri = timestamp.strftime(
+        "http://data.mytransit.nyc.s3.amazonaws.com/subway_time/%Y/%Y-%m/subway_time_%Y%m%d.tar.xz"
     )
 
-    # The tar module does not seem to support reading virtual files via io.BytesIO, we have to go 
-    # to disc.
-    temp_filename = "temp.tar.xz"
-    with open(temp_filename, "wb") as f:
-        f.write(requests.get(uri).content)
+    # A day of feeds is far larger decompressed than compressed, so rather than reading the 
+    # archive out of the response in (non-seekable) stream mode, which would mean holding every 
+    # decompressed member in memory at once, the compressed archive is spooled to an anonymous 
+    # temporary file and opened in (seekable) random access mode. The response is copied over in
+    # large chunks, as the default (64 KB) makes for a great many small reads off of the socket.
+    resp = _session().get(uri, stream=True, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    resp.raw.decode_content = True
+
+    spool = tempfile.TemporaryFile()
+    shutil.copyfileobj(resp.raw, spool, ARCHIVE_BUFSIZE)
+    spool.seek(0)
 
-    archive = tarfile.open(temp_filename, 'r')
-    names = [member.name for member in archive.getmembers()]
-    messages = [archive.extractfile(f) for f in archive.getmembers()]
-    os.remove(temp_filename)
+    archive = tarfile.open(fileobj=spool, mode='r:xz')
+    members = archive.getmembers()
+    names = [member.name for member in members]
+    messages = [archive.extractfile(member) for member in members]
 
     return messages, names
 
 __all__ = [
-    'synthesize_route', 'finish_trip', 'load_mta_archived_feed', 'load_mytransit_archived_feeds'
+    'synthesize_route', 'finish_trip', 'load_mta_archived_feed', 'load_mta_archived_feeds',
+    'load_mytransit_archived_feeds'
 ]
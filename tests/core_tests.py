@@ -3,6 +3,9 @@
 """
 import unittest
 import collections
+import copy
+import warnings
+from unittest import mock
 
 import numpy as np
 import pandas as pd
@@ -13,7 +16,9 @@ import gtfs_tripify as gt
 from gtfs_tripify.tripify import (
     dictify, actionify, logify, tripify, drop_invalid_messages, collate
 )
-from gtfs_tripify.ops import join_logbooks, drop_nonsequential_messages
+from gtfs_tripify.ops import join_logbooks, drop_nonsequential_messages, parse_feed
+
+from fixtures_util import load_gtfs_fixture
 
 
 # some of these tests use ./fixtures/gtfs-* fixtures.
@@ -28,34 +33,32 @@ from gtfs_tripify.ops import join_logbooks, drop_nonsequential_messages
 #     with open('fixtures/' + name, 'wb') as fp: 
 #         fp.write(message.read())
 
-class TestDictify(unittest.TestCase):
-    def setUp(self):
-        with open("./fixtures/gtfs-20160512T0400Z", "rb") as f:
-            gtfs = gtfs_realtime_pb2.FeedMessage()
-            gtfs.ParseFromString(f.read())
 
-        self.gtfs = gtfs
+class TestDictify(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.gtfs = load_gtfs_fixture("gtfs-20160512T0400Z")
 
     def test_dictify(self):
         feed = dictify(self.gtfs)
-        assert set(feed) == {'entity', 'header'}
+        assert feed.keys() == {'entity', 'header'}
         assert feed['header'].keys() == {'timestamp', 'gtfs_realtime_version'}
         assert isinstance(feed['header']['timestamp'], int)
-        assert(dict(collections.Counter([message['type'] for message in feed['entity']]))) ==\
+        assert collections.Counter(message['type'] for message in feed['entity']) ==\
             {'alert': 1, 'trip_update': 94, 'vehicle_update': 68}
         assert len(feed['entity']) == 1 + 94 + 68
 
         assert feed['entity'][-1]['type'] == 'alert'
-        assert set(feed['entity'][-1]['alert']['informed_entity'][0].keys()) ==\
+        assert feed['entity'][-1]['alert']['informed_entity'][0].keys() ==\
             {'route_id', 'trip_id'}
 
         assert feed['entity'][-2]['type'] == 'trip_update'
         assert len(feed['entity'][-2]['trip_update']['stop_time_update']) == 2
-        assert set(feed['entity'][-2]['trip_update']['stop_time_update'][0].keys()) ==\
+        assert feed['entity'][-2]['trip_update']['stop_time_update'][0].keys() ==\
             {'arrival', 'departure', 'stop_id'}
 
         assert feed['entity'][5]['type'] == 'vehicle_update'
-        assert set(feed['entity'][5]['vehicle'].keys()) ==\
+        assert feed['entity'][5]['vehicle'].keys() ==\
             {'trip', 'stop_id', 'timestamp', 'current_stop_sequence', 'current_status'}
 
 
@@ -101,6 +104,8 @@ class TestActionify(unittest.TestCase):
             'STOPPED_AT', 'EXPECTED_TO_ARRIVE_AT', 'EXPECTED_TO_DEPART_AT', 
             'EXPECTED_TO_ARRIVE_AT'
         ]
+        assert pd.api.types.is_numeric_dtype(log['time_assigned'])
+        assert list(log['time_assigned']) == [1463026080, 1463026170, 1463026170, 1463029500]
 
     def test_case_2(self):
         """
@@ -579,6 +584,47 @@ class TestCorrectFeed(unittest.TestCase):
         assert len(feed['entity']) == 0
         assert len(parse_errors) == 1
 
+    def test_vehicle_update_without_trip_update(self):
+        """
+        Assert that we raise a warning, record a parse error, and remove the entry when a feed
+        entity is a vehicle update with no corresponding trip update.
+        """
+        vehicle_message = {
+            'id': '000006',
+            'type': 'vehicle_update',
+            'vehicle': {
+                'current_status': 'INCOMING_AT',
+                'current_stop_sequence': 34,
+                'stop_id': '103S',
+                'timestamp': 1463025417,
+                'trip': {
+                    'route_id': '1',
+                    'start_date': '20160511',
+                    'trip_id': '030000_1..S02R'
+                }
+            }
+        }
+        feed = {
+            'header': {'gtfs_realtime_version': 1,
+                       'timestamp': 1463025417},
+            'entity': [vehicle_message]
+        }
+
+        with pytest.warns(UserWarning):
+            fixed_feed, parse_errors = drop_invalid_messages(feed)
+
+        assert len(fixed_feed['entity']) == 0
+        assert len(parse_errors) == 1
+        assert parse_errors[0]['type'] == 'trip_id_with_vehicle_update_but_no_trip_update'
+        assert parse_errors[0]['details']['trip_id'] == '030000_1..S02R'
+        assert parse_errors[0]['details']['message_index'] == 0
+
+        # updates which were not pre-processed still drop the message, but warn about it
+        with pytest.warns(UserWarning, match='030000_1..S02R'):
+            collated = collate([feed])
+
+        assert len(collated) == 0
+
     def test_trip_message_with_no_stops(self):
         """
         Assert that we raise a warning and remove offending entries when a feed entity
@@ -685,15 +731,25 @@ class DropInvalidUpdateTimestampsTests(unittest.TestCase):
 def create_mock_action_log(actions=None, stops=None, information_time=0, trip_id=None):
     length = len(actions)
     return pd.DataFrame({
-        'trip_id': ['TEST'] * length if trip_id is None else [trip_id] * length,
-        'route_id': [1] * length,
-        'action': actions,
-        'stop_id': ['999X'] * length if stops is None else stops,
-        'information_time': [information_time] * length,
-        'time_assigned': list(range(length))
+        'trip_id': np.full(length, 'TEST' if trip_id is None else trip_id, dtype=object),
+        'route_id': np.full(length, 1, dtype=np.int64),
+        'action': np.asarray(actions, dtype=object),
+        'stop_id': np.full(length, '999X', dtype=object) if stops is None else
+                   np.asarray(stops, dtype=object),
+        'information_time': np.full(length, information_time, dtype=np.int64),
+        'time_assigned': np.arange(length, dtype=np.int64)
     })
 
 
+def with_last_information_time(action_log, information_time):
+    """
+    Returns a copy of the action log with the information time of its last row replaced.
+    """
+    information_times = action_log['information_time'].values.copy()
+    information_times[-1] = information_time
+    return action_log.assign(information_time=information_times)
+
+
 class TripLogUnaryTests(unittest.TestCase):
     """
     Tests for simpler cases which can be processed in a single action log.
@@ -707,11 +763,12 @@ class TripLogUnaryTests(unittest.TestCase):
         result, _ = tripify(actions)
 
         assert len(result) == 1
-        assert result.iloc[0].action == 'STOPPED_AT'
+        row = result.iloc[0]
+        assert row.action == 'STOPPED_AT'
         assert all([
-            str(result.iloc[0]['maximum_time']) == 'nan',
-            str(result.iloc[0]['minimum_time']) == 'nan',
-            int(result.iloc[0]['latest_information_time']) == 0]
+            str(row['maximum_time']) == 'nan',
+            str(row['minimum_time']) == 'nan',
+            int(row['latest_information_time']) == 0]
         )
 
     def test_unary_en_route(self):
@@ -726,10 +783,11 @@ class TripLogUnaryTests(unittest.TestCase):
         result, _ = tripify(actions)
 
         assert len(result) == 1
-        assert result.iloc[0].action == 'EN_ROUTE_TO'
-        assert all([result.iloc[0]['maximum_time'] in [np.nan, 'nan'],
-                    int(result.iloc[0]['minimum_time']) == 0,
-                    int(result.iloc[0]['latest_information_time']) == 0])
+        row = result.iloc[0]
+        assert row.action == 'EN_ROUTE_TO'
+        assert all([row['maximum_time'] in [np.nan, 'nan'],
+                    int(row['minimum_time']) == 0,
+                    int(row['latest_information_time']) == 0])
 
     def test_unary_end(self):
         """
@@ -739,10 +797,11 @@ class TripLogUnaryTests(unittest.TestCase):
             create_mock_action_log(actions=['EXPECTED_TO_ARRIVE_AT'])
         ])
         assert len(result) == 1
-        assert result.iloc[0].action == 'EN_ROUTE_TO'
-        assert all([result.iloc[0]['maximum_time'] in [np.nan, 'nan'],
-                    int(result.iloc[0]['minimum_time']) == 0,
-                    int(result.iloc[0]['latest_information_time']) == 0])
+        row = result.iloc[0]
+        assert row.action == 'EN_ROUTE_TO'
+        assert all([row['maximum_time'] in [np.nan, 'nan'],
+                    int(row['minimum_time']) == 0,
+                    int(row['latest_information_time']) == 0])
 
     def test_unary_arriving_skip(self):
         """
@@ -765,8 +824,8 @@ class TripLogUnaryTests(unittest.TestCase):
 
         assert len(result) == 3
         assert list(result['action'].values) == ['EN_ROUTE_TO', 'EN_ROUTE_TO', 'EN_ROUTE_TO']
-        assert list(result['minimum_time'].values.astype(int)) == [0] * 3
-        assert list(result['maximum_time'].values.astype(str)) == ['nan'] * 3
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0] * 3)
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan] * 3)
 
     def test_unary_departing_skip(self):
         """
@@ -791,8 +850,8 @@ class TripLogUnaryTests(unittest.TestCase):
         assert len(result) == 3
         assert list(result['action'].values) == ['EN_ROUTE_TO', 'EN_ROUTE_TO', 'EN_ROUTE_TO']
         assert result['action'].values.all() == 'EN_ROUTE_TO'
-        assert list(result['minimum_time'].values.astype(int)) == [0] * 3
-        assert list(result['maximum_time'].values.astype(str)) == ['nan'] * 3
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0] * 3)
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan] * 3)
 
     def test_unary_en_route_trip(self):
         """
@@ -808,8 +867,8 @@ class TripLogUnaryTests(unittest.TestCase):
         assert len(result) == 2
         assert list(result['action'].values) == ['EN_ROUTE_TO', 'EN_ROUTE_TO']
         assert result['action'].values.all() == 'EN_ROUTE_TO'
-        assert list(result['minimum_time'].values.astype(int)) == [0] * 2
-        assert list(result['maximum_time'].values.astype(str)) == ['nan'] * 2
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0] * 2)
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan] * 2)
 
     def test_unary_ordinary_stopped_trip(self):
         """
@@ -824,8 +883,8 @@ class TripLogUnaryTests(unittest.TestCase):
 
         assert len(result) == 2
         assert list(result['action'].values) == ['STOPPED_AT', 'EN_ROUTE_TO']
-        assert list(result['minimum_time'].values.astype(str)) == ['nan', '0']
-        assert list(result['maximum_time'].values.astype(str)) == ['nan', 'nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [np.nan, 0])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan, np.nan])
 
 
 class TripLogBinaryTests(unittest.TestCase):
@@ -848,15 +907,15 @@ class TripLogBinaryTests(unittest.TestCase):
         base = create_mock_action_log(actions=['EXPECTED_TO_ARRIVE_AT', 'EXPECTED_TO_ARRIVE_AT'],
                                       stops=['999X', '999X'])
         first = base.head(1)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
         actions = [first, second]
 
         result, _ = tripify(actions)
 
         assert len(result) == 1
         assert list(result['action'].values) == ['EN_ROUTE_TO']
-        assert list(result['minimum_time'].values.astype(int)) == [1]
-        assert list(result['maximum_time'].values.astype(str)) == ['nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [1])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan])
 
     def test_binary_en_route_stop(self):
         """
@@ -869,15 +928,15 @@ class TripLogBinaryTests(unittest.TestCase):
         base = create_mock_action_log(actions=['EXPECTED_TO_ARRIVE_AT', 'STOPPED_AT'],
                                       stops=['999X', '999X'])
         first = base.head(1)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
         actions = [first, second]
 
         result, _ = tripify(actions)
 
         assert len(result) == 1
         assert list(result['action'].values) == ['STOPPED_AT']
-        assert list(result['minimum_time'].values.astype(int)) == [0]
-        assert list(result['maximum_time'].values.astype(str)) == ['nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [np.nan])
 
     def test_binary_stop_or_skip_en_route(self):
         """
@@ -892,15 +951,15 @@ class TripLogBinaryTests(unittest.TestCase):
                                                'EXPECTED_TO_ARRIVE_AT'],
                                       stops=['999X', '999X', '998X', '998X'])
         first = base.head(3)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
         actions = [first, second]
 
         result, _ = tripify(actions)
 
         assert len(result) == 2
         assert list(result['action'].values) == ['STOPPED_OR_SKIPPED', 'EN_ROUTE_TO']
-        assert list(result['minimum_time'].values.astype(int)) == [0, 1]
-        assert list(result['maximum_time'].values.astype(str)) == ['1', 'nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0, 1])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [1, np.nan])
 
     def test_binary_skip_en_route(self):
         """
@@ -915,15 +974,15 @@ class TripLogBinaryTests(unittest.TestCase):
                                                'EXPECTED_TO_ARRIVE_AT'],
                                       stops=['999X', '998X', '998X'])
         first = base.head(2)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
         actions = [first, second]
 
         result, _ = tripify(actions)
 
         assert len(result) == 2
         assert list(result['action'].values) == ['STOPPED_OR_SKIPPED', 'EN_ROUTE_TO']
-        assert list(result['minimum_time'].values.astype(int)) == [0, 1]
-        assert list(result['maximum_time'].values.astype(str)) == ['1', 'nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0, 1])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [1, np.nan])
 
     def test_binary_skip_stop(self):
         """
@@ -938,15 +997,15 @@ class TripLogBinaryTests(unittest.TestCase):
                                                'STOPPED_AT'],
                                       stops=['999X', '998X', '998X'])
         first = base.head(2)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
         actions = [first, second]
 
         result, _ = tripify(actions)
 
         assert len(result) == 2
         assert list(result['action'].values) == ['STOPPED_OR_SKIPPED', 'STOPPED_AT']
-        assert list(result['minimum_time'].values.astype(int)) == [0, 0]
-        assert list(result['maximum_time'].values.astype(str)) == ['1', 'nan']
+        np.testing.assert_array_equal(result['minimum_time'].astype(float), [0, 0])
+        np.testing.assert_array_equal(result['maximum_time'].astype(float), [1, np.nan])
 
 
 class TripLogReroutingTests(unittest.TestCase):
@@ -961,7 +1020,7 @@ class TripLogReroutingTests(unittest.TestCase):
         base = create_mock_action_log(actions=['EXPECTED_TO_ARRIVE_AT', 'EXPECTED_TO_ARRIVE_AT'],
                                       stops=['999X', '998X'])
         first = base.head(1)
-        second = base.assign(information_time=base.information_time.values[:-1].tolist() + [1])
+        second = with_last_information_time(base, 1)
 
         result, _ = tripify([first, second])
 
@@ -1023,38 +1082,58 @@ class LogbookTests(unittest.TestCase):
     """
     Smoke tests for generating trip logbooks and merging them.
     """
-    def setUp(self):
-        with open("./fixtures/gtfs-20160512T0400Z", "rb") as f:
-            gtfs_0 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_0.ParseFromString(f.read())
-
-        with open("./fixtures/gtfs-20160512T0401Z", "rb") as f:
-            gtfs_1 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_1.ParseFromString(f.read())
-
-        self.log_0 = dictify(gtfs_0)
-        self.log_1 = dictify(gtfs_1)
+    @classmethod
+    def setUpClass(cls):
+        # logify does not modify its input, so the fixtures only need to be dictified once.
+        cls.log_0 = dictify(load_gtfs_fixture("gtfs-20160512T0400Z"))
+        cls.log_1 = dictify(load_gtfs_fixture("gtfs-20160512T0401Z"))
 
     def test_logbook(self):
         logbook, _, _ = logify([self.log_0, self.log_1])
         assert len(logbook) == 94
 
+    def test_logbook_does_not_modify_input(self):
+        """
+        The parsed fixtures are shared between tests, which is only safe so long as logify leaves
+        the updates it is given untouched.
+        """
+        updates = [copy.deepcopy(self.log_0), copy.deepcopy(self.log_1)]
+        logify(updates)
+        assert updates == [self.log_0, self.log_1]
+
+    def test_logbook_parse_error_order(self):
+        """
+        Parse errors are grouped by the step which raised them, not interleaved by update.
+        """
+        def serialized_feed(timestamp, null_trip_id=False):
+            feed = gtfs_realtime_pb2.FeedMessage()
+            feed.header.gtfs_realtime_version = '1.0'
+            feed.header.timestamp = timestamp
+            if null_trip_id:
+                entity = feed.entity.add()
+                entity.id = '1'
+                entity.vehicle.trip.route_id = '1'
+            return feed.SerializeToString()
+
+        updates = [serialized_feed(1, null_trip_id=True), b'garbage', serialized_feed(1)]
+        with pytest.warns(UserWarning):
+            _, _, parse_errors = logify(updates)
+
+        assert [error['type'] for error in parse_errors] == [
+            'parsing_into_protobuf_raised_exception', 'message_with_null_trip_id', 
+            'feed_updates_with_duplicate_timestamps'
+        ]
+
 
 class LogbookJoinTests(unittest.TestCase):
     """
     These tests make sure that the logbook join logic is correct.
     """
-    def setUp(self):
-        with open("./fixtures/gtfs-20160512T0400Z", "rb") as f:
-            gtfs_0 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_0.ParseFromString(f.read())
-
-        with open("./fixtures/gtfs-20160512T0401Z", "rb") as f:
-            gtfs_1 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_1.ParseFromString(f.read())
-
-        self.log_0 = dictify(gtfs_0)
-        self.log_1 = dictify(gtfs_1)
+    @classmethod
+    def setUpClass(cls):
+        # logify does not modify its input, so the fixtures only need to be dictified once.
+        cls.log_0 = dictify(load_gtfs_fixture("gtfs-20160512T0400Z"))
+        cls.log_1 = dictify(load_gtfs_fixture("gtfs-20160512T0401Z"))
 
     def test_logbook_join(self):
         left, left_timestamps, _ = logify([self.log_0])
@@ -1063,8 +1142,8 @@ class LogbookJoinTests(unittest.TestCase):
         result, result_timestamps = join_logbooks(left, left_timestamps, right, right_timestamps)
         assert len(result) == 94
         assert result.keys() == left.keys()  # only true in this simple case
-        assert (result[list(result.keys())[0]].head(1) !=
-                left[list(result.keys())[0]].head(1)).any().any()
+        first_key = next(iter(result))
+        assert (result[first_key].head(1) != left[first_key].head(1)).any().any()
         assert len(result_timestamps) == 94
 
     def test_trivial_join(self):
@@ -1079,7 +1158,7 @@ class LogbookJoinTests(unittest.TestCase):
         timestamps = {'uuid': [information_time]}
 
         # empty right and nonempty left
-        empty_logbook, empty_timestamps = pd.DataFrame(columns=trip.columns), dict()
+        empty_logbook, empty_timestamps = dict(), dict()
         result, _ = join_logbooks(logbook, timestamps, empty_logbook, empty_timestamps)
         assert result.keys() == logbook.keys()
 
@@ -1140,6 +1219,30 @@ class LogbookJoinTests(unittest.TestCase):
         assert result_timestamps['uuid1'] == [1, 2]
         assert result['uuid1'].action.values.tolist() == ['STOPPED_OR_SKIPPED', 'STOPPED_AT']
 
+    def test_incomplete_completable_trips_timestamps(self):
+        """
+        The timestamps of a joined trip are those of the left trip followed by those of the right
+        trip it was joined with, regardless of where that trip falls in the right logbook.
+        """
+        actions_1 = create_mock_action_log(
+            actions=['EN_ROUTE_TO', 'EN_ROUTE_TO'], information_time=1, stops=['500X', '501X']
+        )
+        actions_2 = create_mock_action_log(
+            actions=['STOPPED_AT'], information_time=2, stops=['501X']
+        )
+        actions_3 = create_mock_action_log(
+            actions=['STOPPED_AT'], information_time=3, stops=['600X'], trip_id='OTHER'
+        )
+        left_logbook = {'uuid1': tripify([actions_1])[0]}
+        left_timestamps = {'uuid1': [1]}
+        right_logbook = {'uuid2': tripify([actions_2])[0], 'uuid3': tripify([actions_3])[0]}
+        right_timestamps = {'uuid2': [2], 'uuid3': [3]}
+
+        result, result_timestamps =\
+            join_logbooks(left_logbook, left_timestamps, right_logbook, right_timestamps)
+        assert result_timestamps['uuid1'] == [1, 2]
+        assert result_timestamps['uuid3'] == [3]
+
     def test_incomplete_uncompletable_trip(self):
         """
         There is a trip on the left that is incomplete, but no new information is offered on
@@ -1182,6 +1285,32 @@ class LogbookJoinTests(unittest.TestCase):
         )
         assert result['uuid1'].action.values.tolist() == ['STOPPED_OR_SKIPPED']
 
+    def test_ragged_right_timestamps(self):
+        """
+        Trips on the right may have been seen a different number of times. The first timestamp
+        on the right is the earliest of all of them.
+        """
+        actions1 = create_mock_action_log(
+            actions=['EN_ROUTE_TO'], information_time=1, trip_id='A'
+        )
+        trip1 = tripify([actions1])[0]
+        left_logbook, left_timestamps = {'uuid1': trip1}, {'uuid1': [1]}
+
+        actions2 = create_mock_action_log(
+            actions=['STOPPED_AT'], information_time=3, trip_id='B'
+        )
+        actions3 = create_mock_action_log(
+            actions=['STOPPED_AT'], information_time=2, trip_id='C'
+        )
+        right_logbook = {'uuid2': tripify([actions2])[0], 'uuid3': tripify([actions3])[0]}
+        right_timestamps = {'uuid2': [3], 'uuid3': [2, 3]}
+
+        result, _ = join_logbooks(
+            left_logbook, left_timestamps, right_logbook, right_timestamps
+        )
+        assert result['uuid1'].action.values.tolist() == ['STOPPED_OR_SKIPPED']
+        assert result['uuid1'].maximum_time.values.tolist() == [2]
+
 
 def create_mock_update_feed(
     stop_time_update, trip_id=None, route_id=None, timestamp=None, current_status=None,
@@ -1296,3 +1425,66 @@ class LogbookTripMergeTests(unittest.TestCase):
 
         result, _, _ = logify([feed_1, feed_2, feed_3])
         assert len(result) == 1
+
+
+class CollateTests(unittest.TestCase):
+    """
+    Tests for sorting the messages in an update stream into per-trip message lists.
+    """
+    def test_vehicle_update_precedes_trip_update(self):
+        """
+        Vehicle updates may appear before their corresponding trip updates in the feed. These
+        should still be keyed to the right trip.
+        """
+        stop_seq = [{'arrival': 1463026080, 'departure': np.nan, 'stop_id': '103S'}]
+        feed_1 = create_mock_update_feed(stop_seq, trip_id='1', current_stop_id='103S')
+        feed_2 = create_mock_update_feed(stop_seq, trip_id='2', current_stop_id='103S')
+        feed = {
+            'header': feed_1['header'],
+            'entity': feed_1['entity'][::-1] + feed_2['entity'][::-1]
+        }
+
+        result = collate([feed])
+        assert len(result) == 2
+        for message_collection in result.values():
+            message = message_collection[0]
+            assert (message['trip_update']['trip_update']['trip']['trip_id'] ==
+                    message['vehicle_update']['vehicle']['trip']['trip_id'])
+
+
+class ParseFeedTests(unittest.TestCase):
+    def setUp(self):
+        feed = gtfs_realtime_pb2.FeedMessage()
+        feed.header.gtfs_realtime_version = '1.0'
+        feed.header.timestamp = 1
+        self.feed = feed.SerializeToString()
+
+    @mock.patch('gtfs_tripify.ops._warned_protobuf_implementation', False)
+    @mock.patch('gtfs_tripify.ops._PROTOBUF_IMPLEMENTATION', 'python')
+    def test_pure_python_protobuf_warning(self):
+        """
+        Parsing feeds with the pure-Python Protobuf implementation warns once, pointing at the
+        caller.
+        """
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            parse_feed(self.feed)
+            parse_feed(self.feed)
+
+        assert len(caught) == 1
+        assert caught[0].filename == __file__
+
+    @mock.patch('gtfs_tripify.ops._warned_protobuf_implementation', False)
+    @mock.patch('gtfs_tripify.ops._PROTOBUF_IMPLEMENTATION', 'python')
+    def test_pure_python_protobuf_warning_logify(self):
+        """
+        When feeds are parsed by logify, the warning points at the caller of logify, not at the
+        library code which parses the feeds.
+        """
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            logify([self.feed, self.feed])
+
+        caught = [w for w in caught if 'pure-Python Protobuf' in str(w.message)]
+        assert len(caught) == 1
+        assert caught[0].filename == __file__
@@ -0,0 +1,20 @@
+"""
+Helpers shared by the `gtfs-tripify` test modules.
+"""
+import functools
+
+from google.transit import gtfs_realtime_pb2
+
+
+@functools.lru_cache(maxsize=None)
+def load_gtfs_fixture(name):
+    """
+    Parses a ./fixtures/gtfs-* fixture. Parsing is by far the slowest part of setting up the tests
+    that use these fixtures, and nothing in the library modifies the parsed feed, so each fixture
+    is only parsed once per test session.
+    """
+    with open("./fixtures/" + name, "rb") as f:
+        gtfs = gtfs_realtime_pb2.FeedMessage()
+        gtfs.ParseFromString(f.read())
+
+    return gtfs
@@ -2,31 +2,24 @@
 `gtfs-tripify` IO test module. Asserts that IO functions are correct.
 """
 import unittest
-import sqlite3
+import io
 import warnings
-import os
 
 import pandas as pd
-from google.transit import gtfs_realtime_pb2
 
 from gtfs_tripify.tripify import logify, dictify
 from gtfs_tripify.ops import to_gtfs, to_csv, from_csv
 
+from fixtures_util import load_gtfs_fixture
+
+
 class TestLogbooksToGTFS(unittest.TestCase):
     """
     Test the logbook GTFS writer utility.
     """
     def setUp(self):
-        with open("./fixtures/gtfs-20160512T0400Z", "rb") as f:
-            gtfs_0 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_0.ParseFromString(f.read())
-
-        with open("./fixtures/gtfs-20160512T0401Z", "rb") as f:
-            gtfs_1 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_1.ParseFromString(f.read())
-
-        self.log_0 = dictify(gtfs_0)
-        self.log_1 = dictify(gtfs_1)
+        self.log_0 = dictify(load_gtfs_fixture("gtfs-20160512T0400Z"))
+        self.log_1 = dictify(load_gtfs_fixture("gtfs-20160512T0401Z"))
         self.logbook, _, _ = logify([self.log_0, self.log_1])
 
         for unique_trip_id in self.logbook:
@@ -44,24 +37,42 @@ class TestLogbooksToCSV(unittest.TestCase):
     Test the logbook CSV writer utility.
     """
     def setUp(self):
-        with open("./fixtures/gtfs-20160512T0400Z", "rb") as f:
-            gtfs_0 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_0.ParseFromString(f.read())
-
-        with open("./fixtures/gtfs-20160512T0401Z", "rb") as f:
-            gtfs_1 = gtfs_realtime_pb2.FeedMessage()
-            gtfs_1.ParseFromString(f.read())
-
-        self.log_0 = dictify(gtfs_0)
-        self.log_1 = dictify(gtfs_1)
+        self.log_0 = dictify(load_gtfs_fixture("gtfs-20160512T0400Z"))
+        self.log_1 = dictify(load_gtfs_fixture("gtfs-20160512T0401Z"))
         self.logbook, _, _ = logify([self.log_0, self.log_1])
 
     def test_to_csv_roundtrip(self):
-        to_csv(self.logbook, 'temp.csv')
-        result = from_csv('temp.csv')
+        buf = io.StringIO()
+        to_csv(self.logbook, buf)
+        buf.seek(0)
+        result = from_csv(buf)
 
         assert result.keys() == self.logbook.keys()
-        example_uid = list(result.keys())[0]
-        assert result[example_uid].reset_index(drop=True)\
-            .equals(self.logbook[example_uid].reset_index(drop=True))
-        os.remove('temp.csv')
+        for uid in result:
+            pd.testing.assert_frame_equal(
+                result[uid].reset_index(drop=True), self.logbook[uid].reset_index(drop=True)
+            )
+
+    def test_to_csv_roundtrip_numeric_route_ids(self):
+        """
+        A logbook made up only of trips on numbered routes reads back with string route ids.
+        """
+        logbook = {
+            uid: log for uid, log in self.logbook.items() if log['route_id'].iloc[0].isdigit()
+        }
+        buf = io.StringIO()
+        to_csv(logbook, buf)
+        buf.seek(0)
+        result = from_csv(buf)
+
+        assert result.keys() == logbook.keys()
+        for uid in result:
+            pd.testing.assert_frame_equal(
+                result[uid].reset_index(drop=True), logbook[uid].reset_index(drop=True)
+            )
+
+    def test_to_csv_roundtrip_empty(self):
+        buf = io.StringIO()
+        to_csv(dict(), buf)
+        buf.seek(0)
+        assert from_csv(buf) == dict()
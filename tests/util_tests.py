@@ -2,21 +2,28 @@
 `gtfs-tripify` utilities test module. Asserts that utility functions are correct.
 """
 import unittest
+import datetime
+import io
+import tarfile
+import threading
+import time
+from unittest import mock
+
+import numpy as np
 import pandas as pd
+import requests
 
 import gtfs_tripify as gt
 from gtfs_tripify.ops import cut_cancellations, discard_partial_logs
+from gtfs_tripify.utils import synthesize_route
+from gtfs_tripify.tripify import TRIP_LOG_COLUMNS
 
 
 class TestCutCancellations(unittest.TestCase):
     """
     Tests the cut-cancellation heuristic.
     """
-    def setUp(self):
-        self.log_columns = [
-            'trip_id', 'route_id', 'action', 'minimum_time', 'maximum_time', 'stop_id',
-            'latest_information_time'
-        ]
+    log_columns = TRIP_LOG_COLUMNS
 
     def test_no_op(self):
         """
@@ -33,7 +40,7 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(
             columns=self.log_columns, 
-            data=[['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', '_']]
+            data=[['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0]]
         )
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -46,7 +53,7 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(
             columns=self.log_columns, 
-            data=[['_', '_', 'STOPPED_AT', '_', '_', '_', '_']]
+            data=[['_', '_', 'STOPPED_AT', np.nan, np.nan, '_', 0]]
         )
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -59,8 +66,8 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(columns=self.log_columns,
                            data=[
-                               ['_', '_', 'STOPPED_AT', '_', '_', '_', '_'],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', '_']
+                               ['_', '_', 'STOPPED_AT', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0]
                            ])
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -74,9 +81,9 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(columns=self.log_columns,
                            data=[
-                               ['_', '_', 'STOPPED_AT', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 1]
+                               ['_', '_', 'STOPPED_AT', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 1]
                            ])
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -90,9 +97,9 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(columns=self.log_columns,
                            data=[
-                               ['_', '_', 'STOPPED_AT', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 1],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 1]
+                               ['_', '_', 'STOPPED_AT', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 1],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 1]
                            ])
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -106,9 +113,9 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(columns=self.log_columns,
                            data=[
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 1],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 1]
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 1],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 1]
                            ])
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -120,9 +127,9 @@ class TestCutCancellations(unittest.TestCase):
         """
         log = pd.DataFrame(columns=self.log_columns,
                            data=[
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 0],
-                               ['_', '_', 'STOPPED_OR_SKIPPED', '_', '_', '_', 0]
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0],
+                               ['_', '_', 'STOPPED_OR_SKIPPED', np.nan, np.nan, '_', 0]
                            ])
         logbook = {'uuid': log}
         result = cut_cancellations(logbook)
@@ -133,11 +140,7 @@ class TestDiscardPartialLogs(unittest.TestCase):
     """
     Tests the partial log heuristic.
     """
-    def setUp(self):
-        self.log_columns = [
-            'trip_id', 'route_id', 'action', 'minimum_time', 'maximum_time', 'stop_id',
-            'latest_information_time'
-        ]
+    log_columns = TRIP_LOG_COLUMNS
 
     def test_single_discard(self):
         """
@@ -146,12 +149,12 @@ class TestDiscardPartialLogs(unittest.TestCase):
         """
         first = pd.DataFrame(columns=self.log_columns,
                              data=[
-                                 ['_', '_', '_', '_', '_', '_', 0],
-                                 ['_', '_', '_', '_', '_', '_', 2]
+                                 ['_', '_', '_', np.nan, np.nan, '_', 0],
+                                 ['_', '_', '_', np.nan, np.nan, '_', 2]
                              ])
         second = pd.DataFrame(columns=self.log_columns,
                              data=[
-                                 ['_', '_', '_', '_', '_', '_', 1]
+                                 ['_', '_', '_', np.nan, np.nan, '_', 1]
                              ])
         logbook = {'_0': first, '_1': second}
         result = discard_partial_logs(logbook)
@@ -164,19 +167,149 @@ class TestDiscardPartialLogs(unittest.TestCase):
         """
         first = pd.DataFrame(columns=self.log_columns,
                              data=[
-                                 ['_', '_', '_', '_', '_', '_', 0],
-                                 ['_', '_', '_', '_', '_', '_', 1]
+                                 ['_', '_', '_', np.nan, np.nan, '_', 0],
+                                 ['_', '_', '_', np.nan, np.nan, '_', 1]
                              ])
         second = pd.DataFrame(columns=self.log_columns,
                               data=[
-                                   ['_', '_', '_', '_', '_', '_', 1]
+                                   ['_', '_', '_', np.nan, np.nan, '_', 1]
                               ])
         third = pd.DataFrame(columns=self.log_columns,
                              data=[
-                                 ['_', '_', '_', '_', '_', '_', 0],
-                                 ['_', '_', '_', '_', '_', '_', 2]
+                                 ['_', '_', '_', np.nan, np.nan, '_', 0],
+                                 ['_', '_', '_', np.nan, np.nan, '_', 2]
                              ])
 
         logbook = {'_0': first, '_1': second, '_2': third}
         result = discard_partial_logs(logbook)
         assert len(result) == 1
+
+
+class TestSynthesizeRoute(unittest.TestCase):
+    """
+    Tests synthesizing a route out of a history of station lists.
+    """
+    def test_synthesize_route(self):
+        assert synthesize_route([['A', 'B'], ['B', 'C'], ['B', 'C']]) == ['A', 'B', 'C']
+
+    def test_synthesize_route_cache(self):
+        """
+        Syntheses are memoized in the cache, keyed on the station list history, and every call
+        returns a list of its own.
+        """
+        cache = dict()
+        first = synthesize_route([['A', 'B'], ['B', 'C']], cache)
+        first.append('D')
+        second = synthesize_route([('A', 'B'), ('B', 'C')], cache)
+
+        assert second == ['A', 'B', 'C']
+        assert list(cache.values()) == [('A', 'B', 'C')]
+
+def mock_response(content):
+    """
+    Returns a stand-in for a streamed ``requests`` response with the given body.
+    """
+    resp = mock.Mock()
+    resp.raw = io.BytesIO(content)
+    return resp
+
+
+class TestLoadMytransitArchivedFeeds(unittest.TestCase):
+    """
+    Tests loading a day of feeds out of the data.mytransit.nyc archive.
+    """
+    def setUp(self):
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w:xz') as archive:
+            for name, content in [('gtfs-20160512T0400Z', b'foo'), ('gtfs-20160512T0401Z', b'bar')]:
+                info = tarfile.TarInfo(name)
+                info.size = len(content)
+                archive.addfile(info, io.BytesIO(content))
+        self.archive = buffer.getvalue()
+
+    def test_load(self):
+        """
+        Every member of the archive is returned, in archive order, alongside its name.
+        """
+        session = mock.Mock()
+        session.get.return_value = mock_response(self.archive)
+        with mock.patch('gtfs_tripify.utils._session', return_value=session):
+            messages, names = gt.utils.load_mytransit_archived_feeds(
+                timestamp=datetime.datetime(2016, 5, 12, 4, 0)
+            )
+
+        uri = session.get.call_args[0][0]
+        assert uri.endswith('/subway_time/2016/2016-05/subway_time_20160512.tar.xz')
+        assert names == ['gtfs-20160512T0400Z', 'gtfs-20160512T0401Z']
+        assert [message.read() for message in messages] == [b'foo', b'bar']
+
+    def test_load_is_lazy(self):
+        """
+        The members are read out of the archive on demand, in any order.
+        """
+        session = mock.Mock()
+        session.get.return_value = mock_response(self.archive)
+        with mock.patch('gtfs_tripify.utils._session', return_value=session):
+            messages, _ = gt.utils.load_mytransit_archived_feeds()
+
+        assert not isinstance(messages[0], io.BytesIO)
+        assert messages[1].read() == b'bar'
+        assert messages[0].read() == b'foo'
+
+
+class TestLoadMtaArchivedFeeds(unittest.TestCase):
+    """
+    Tests concurrently loading feeds out of the MTA archive.
+    """
+    timestamps = ['2014-09-17-09-31', '2014-09-17-09-36', '2014-09-17-09-41', '2014-09-17-09-46']
+
+    def get(self, uri, timeout=None):
+        """
+        Stands in for ``Session.get``. Earlier feeds take longer to load, so the downloads finish
+        in the reverse of the order they were started in.
+        """
+        timestamp = uri.split('gtfs-')[-1]
+        time.sleep(0.01 * (len(self.timestamps) - self.timestamps.index(timestamp)))
+        resp = mock.Mock()
+        resp.content = timestamp.encode()
+        if timestamp in self.failing:
+            resp.raise_for_status.side_effect = requests.HTTPError(f'404 for {uri}')
+        return resp
+
+    def setUp(self):
+        self.failing = set()
+        self.session = mock.Mock()
+        self.session.get.side_effect = self.get
+
+    def test_load_order(self):
+        """
+        The feeds are returned in the order of the timestamps given, not the order the downloads
+        finish in.
+        """
+        with mock.patch('gtfs_tripify.utils._session', return_value=self.session):
+            feeds = gt.utils.load_mta_archived_feeds(timestamps=self.timestamps)
+
+        assert [feed.content.decode() for feed in feeds] == self.timestamps
+
+    def test_load_failure(self):
+        """
+        A single failed download raises, instead of being dropped from the result.
+        """
+        self.failing = {self.timestamps[2]}
+        with mock.patch('gtfs_tripify.utils._session', return_value=self.session):
+            with self.assertRaises(requests.HTTPError):
+                gt.utils.load_mta_archived_feeds(timestamps=self.timestamps)
+
+    def test_shared_session(self):
+        """
+        The workers share one session, which is kept (with its connections) between calls, and
+        which pools as many connections per host as there are workers.
+        """
+        sessions = []
+        thread = threading.Thread(target=lambda: sessions.append(gt.utils._session()))
+        thread.start()
+        thread.join()
+
+        assert gt.utils._session() is sessions[0]
+        adapter = sessions[0].get_adapter('https://datamine-history.s3.amazonaws.com/')
+        assert adapter._pool_maxsize == gt.utils.POOL_SIZE